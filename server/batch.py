@@ -0,0 +1,104 @@
+from cache import atomic_path
+from lectionary import UpstreamError
+from payload import Payload, parse
+from readings import reading_blocks
+
+from concurrent.futures import ProcessPoolExecutor
+import copy
+import multiprocessing
+import os
+import re
+import threading
+
+BATCH_WORKERS = int(os.getenv('BATCH_WORKERS', os.cpu_count() or 1))
+MAX_BATCH = int(os.getenv('MAX_BATCH', 60))
+
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+def pool() -> ProcessPoolExecutor:
+    '''
+    Worker processes for rendering. python-docx is pure Python and holds the GIL, so threads would
+    not render in parallel. Workers are spawned rather than forked because the server is threaded.
+    '''
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(BATCH_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+def render(payload: Payload, path: str, **assets) -> str:
+    '''Builds `payload` into `path` with the parish's `assets` (logo and fixed texts). Runs inside a pool worker.'''
+    from bulletin import build_payload
+    with atomic_path(path) as tmp:
+        build_payload(payload, tmp, **assets)
+    return path
+
+def merge(base: dict, overrides: dict) -> dict:
+    '''`base` with `overrides` applied recursively. Lists are replaced, not merged.'''
+    out = copy.deepcopy(base)
+    for key, value in overrides.items():
+        if isinstance(value, dict) and isinstance(out.get(key), dict):
+            out[key] = merge(out[key], value)
+        else:
+            out[key] = copy.deepcopy(value)
+    return out
+
+def item_name(item: dict, n: int, taken: set[str]) -> str:
+    name = re.sub(r'[^a-zA-Z0-9\-_ ]', '', str(item.get('name') or '')).strip() or f'bulletin-{n + 1}'
+    unique, k = name, 2
+    while unique in taken:
+        unique, k = f'{name}-{k}', k + 1
+    taken.add(unique)
+    return unique
+
+def batch_items(body: dict, load_template, resolve=None) -> list[tuple[str, Payload | None, str | None]]:
+    '''
+    Resolves a /build/batch request into (name, checked payload, error) per item. Items are either
+    `{"payload": {...}}` or overrides for the request's `template`:
+
+        {"template": "Sunday", "items": [
+            {"name": "2025-08-31", "readings": <readings.json>, "overrides": {"front": {...}}}
+        ]}
+
+    `readings` takes a readings.json-style response and replaces the template's readings, or a
+    yyyymmdd date whose stored readings are laid out like the template's. `resolve(payload)`
+    turns readings given by date into the readings themselves.
+    '''
+    items = body.get('items')
+    if not isinstance(items, list) or not items:
+        raise ValueError('items must be a non-empty list')
+    if len(items) > MAX_BATCH:
+        raise ValueError(f'at most {MAX_BATCH} items per batch')
+
+    template = None
+    if body.get('template'):
+        template = load_template(body['template'])
+
+    taken = set()
+    resolved = []
+    for n, item in enumerate(items):
+        name = item_name(item if isinstance(item, dict) else {}, n, taken)
+        try:
+            if not isinstance(item, dict):
+                raise ValueError('item must be an object')
+            if 'payload' in item:
+                payload = item['payload']
+            elif template is None:
+                raise ValueError('item has no payload and the batch has no template')
+            else:
+                overrides = item.get('overrides', {})
+                if not isinstance(overrides, dict):
+                    raise ValueError('overrides must be an object')
+                payload = merge(template, overrides)
+                if isinstance(item.get('readings'), str):
+                    payload['readings']['date'] = item['readings']
+                elif item.get('readings'):
+                    payload['readings']['readings'] = reading_blocks(item['readings'])
+            if resolve is not None:
+                payload = resolve(payload)
+            resolved.append((name, parse(payload), None))
+        except (KeyError, TypeError, ValueError, OSError, UpstreamError) as e:
+            resolved.append((name, None, f'{type(e).__name__}: {e}'))
+
+    return resolved
@@ -0,0 +1,591 @@
+'''
+Benchmarks for `bulletin.build()` and `parseText`.
+
+    python bench.py                         # every case, JSON report on stdout
+    python bench.py -o bench.json           # ...written to a file
+    python bench.py --compare bench.json    # report changes against an earlier run
+    python bench.py --cprofile large        # cProfile the hot path of one case
+    python bench.py imports                 # cold import time of the server
+    python bench.py incremental             # incremental rebuilds, checked against full ones
+    python bench.py preflight               # layout estimate of every case, no rendering
+    python bench.py payload                 # payload validation, checked to round-trip
+    python bench.py readings                # readings store lookups, from disk and from memory
+    python bench.py transfer                # bytes a preview uploads: whole, gzipped, as a delta
+    python bench.py wordml                  # both DOCX backends, checked to write the same document
+    python bench.py scaling                 # build time against latest-info and notice row counts
+    python bench.py tenants                 # one parish's builds while another's queue is full
+
+Every case runs in a fresh process so peak RSS and cold-start numbers are per case.
+'''
+from pathlib import Path
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+
+from readings import reading_block
+
+cwd = Path(__file__).parent.resolve()
+
+def load_fixture(name: str):
+    with open(cwd/name if (cwd/name).exists() else cwd.parent/name, encoding='utf-8') as f:
+        return json.load(f)
+
+def vocabulary() -> list[str]:
+    words = []
+    for reading in load_fixture('readings.json')['readings']:
+        for line in reading['text']:
+            for part in (line if isinstance(line, list) else [line]):
+                words.extend(part.split())
+    return words
+
+def make_text(rng: random.Random, words: list[str], n_words: int, density: float, lines: int = 1) -> str:
+    '''Random prose with roughly `density` of the words wrapped in b/i/u tags.'''
+    out = []
+    for _ in range(n_words):
+        word = rng.choice(words)
+        if rng.random() < density:
+            tag = rng.choice('biu')
+            word = f'<{tag}>{word}</{tag}>'
+        out.append(word)
+
+    per_line = max(1, n_words // lines)
+    return '<br>'.join(' '.join(out[i:i + per_line]) for i in range(0, len(out), per_line))
+
+def make_info(rng, words, rows: int, density: float) -> list:
+    '''latest-info groups of up to three rows, every other one with a side column.'''
+    groups = []
+    while rows > 0:
+        n = min(3, rows)
+        side = [8, make_text(rng, words, 6, density, 3)] if len(groups) % 2 else [0, '']
+        groups.append([side] + [[rng.randint(0, 1), 1, make_text(rng, words, 8, density)] for _ in range(n)])
+        rows -= n
+    return groups
+
+def make_payload(
+    info_rows: int | None = None,
+    back_entries: int | None = None,
+    mass_cells: int | None = None,
+    reading_scale: int | None = None,
+    density: float = 0.1,
+    readings_fixture: bool = False,
+    seed: int = 0,
+) -> dict:
+    '''server/test.json with selected sections replaced by synthetic content of the given size.'''
+    rng = random.Random(seed)
+    words = vocabulary()
+    payload = load_fixture('test.json')
+
+    if info_rows is not None:
+        payload['front']['latest-info'] = make_info(rng, words, info_rows, density)
+    if back_entries is not None:
+        payload['back'] = [[10, 0.8, make_text(rng, words, 40, density, 3)] for _ in range(back_entries)]
+    if mass_cells is not None:
+        payload['front']['mass-info'] = [make_text(rng, words, 12, density, 2) for _ in range(mass_cells)]
+    if readings_fixture or reading_scale is not None:
+        payload['readings']['readings'] = [reading_block(r) for r in load_fixture('readings.json')['readings']]
+    if reading_scale is not None:
+        for reading in payload['readings']['readings']:
+            if reading['type'] != 'psalm':
+                n_words = len(reading['text'].split()) * reading_scale
+                reading['text'] = make_text(rng, words, n_words, density, reading['text'].count('<br>') * reading_scale + 1)
+
+    return payload
+
+CASES = {
+    'test.json': {},
+    'readings.json': {'readings_fixture': True},
+    'info-20': {'info_rows': 20},
+    'back-60': {'back_entries': 60},
+    'mass-8': {'mass_cells': 8},
+    'readings-x4': {'reading_scale': 4},
+    'markup-dense': {'info_rows': 9, 'back_entries': 15, 'reading_scale': 2, 'density': 0.6},
+    'large': {'info_rows': 20, 'back_entries': 60, 'mass_cells': 8, 'reading_scale': 4, 'density': 0.3},
+}
+
+def peak_rss_kb() -> int:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == 'darwin' else rss
+
+def ms(seconds: float) -> float:
+    return round(seconds * 1000, 2)
+
+def run_build_case(kwargs: dict, repeat: int) -> dict:
+    os.chdir(cwd)
+    from bulletin import build_payload
+    from timing import profiling
+
+    payload = make_payload(**kwargs)
+    rss_before = peak_rss_kb()
+    walls, profiles = [], []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp)/'bench.docx'
+        for _ in range(repeat + 1):
+            with profiling() as profile:
+                start = time.perf_counter()
+                build_payload(payload, path, incremental=False)
+                walls.append(time.perf_counter() - start)
+            profiles.append(profile)
+        size = path.stat().st_size
+
+    warm = walls[1:]
+    phases = sorted({name for p in profiles[1:] for name in p.spans})
+    return {
+        'cold_ms': ms(walls[0]),
+        'wall_ms': {'min': ms(min(warm)), 'median': ms(statistics.median(warm))},
+        'phases_ms': {name: ms(statistics.median(p.spans.get(name, 0) for p in profiles[1:])) for name in phases},
+        'counts': dict(sorted(profiles[-1].counts.items())),
+        'peak_rss_kb': peak_rss_kb(),
+        'rss_growth_kb': peak_rss_kb() - rss_before,
+        'docx_bytes': size,
+    }
+
+def run_parse_case(repeat: int) -> dict:
+    os.chdir(cwd)
+    from docx import Document
+    import bulletin
+    import markup
+
+    rng = random.Random(0)
+    words = vocabulary()
+    results = {}
+    for n_words in (100, 1000, 5000):
+        text = make_text(rng, words, n_words, 0.2, n_words // 12)
+        cold, warm = [], []
+        for _ in range(repeat):
+            cell = Document().add_table(rows=1, cols=1).cell(0, 0)
+            bulletin.normalize_cell(cell)
+            markup.compile_markup.cache_clear()
+            for times in (cold, warm):
+                start = time.perf_counter()
+                bulletin.parseText(cell, text, 11, 1)
+                times.append(time.perf_counter() - start)
+
+        runs = sum(len(p.runs) for p in markup.compile_markup(text))
+        results[f'{n_words}-words'] = {
+            'cold_ms': ms(statistics.median(cold)),
+            'warm_ms': ms(statistics.median(warm)),
+            'runs': runs,
+            'warm_us_per_run': round(statistics.median(warm) / runs * 1e6, 2),
+        }
+    return results
+
+def docx_parts(blob: bytes) -> dict[str, bytes]:
+    with zipfile.ZipFile(io.BytesIO(blob)) as z:
+        return {name: z.read(name) for name in z.namelist()}
+
+def run_incremental_case(repeat: int) -> dict:
+    '''
+    Edits one section at a time and rebuilds incrementally, then fully, with each backend. Every
+    part of the two documents must be byte-identical (the zip entry timestamps are not compared).
+    '''
+    os.chdir(cwd)
+    from bulletin import build_payload
+
+    def edit_front(payload, n):
+        payload['front']['title'] += f' {n}'
+    def edit_back(payload, n):
+        payload['back'][0][2] += f' <b>{n}</b>'
+    def edit_readings(payload, n):
+        payload['readings']['readings'][0]['size'] += 0.5
+
+    results = {}
+    # python-docx splices cached sections into its document, wordml into its XML
+    for backend in ('wordml', 'python-docx'):
+        payload = make_payload(**CASES['large'])
+        build_payload(payload, io.BytesIO(), backend=backend)
+        for name, edit in (('front', edit_front), ('back', edit_back), ('readings', edit_readings)):
+            incremental, full, identical = [], [], True
+            for n in range(repeat):
+                edit(payload, n)
+                for times, flag in ((incremental, True), (full, False)):
+                    out = io.BytesIO()
+                    start = time.perf_counter()
+                    build_payload(payload, out, incremental=flag, backend=backend)
+                    times.append(time.perf_counter() - start)
+                    if flag:
+                        spliced = out.getvalue()
+                identical = identical and docx_parts(spliced) == docx_parts(out.getvalue())
+            results[f'{backend}/{name}-edit'] = {
+                'incremental_ms': ms(statistics.median(incremental)),
+                'full_ms': ms(statistics.median(full)),
+                'identical': identical,
+            }
+    return results
+
+def run_preflight_case(repeat: int) -> dict:
+    os.chdir(cwd)
+    import layout
+
+    results = {}
+    for name, kwargs in CASES.items():
+        payload = make_payload(**kwargs)
+        times = []
+        for _ in range(repeat + 1):
+            start = time.perf_counter()
+            report = layout.preflight(payload, cwd/'logo.png')
+            times.append(time.perf_counter() - start)
+        results[name] = {
+            'cold_ms': ms(times[0]),
+            'warm_ms': ms(statistics.median(times[1:])),
+            'fill': {cell: result['fill'] for cell, result in report['cells'].items()},
+        }
+    return results
+
+def run_payload_case(repeat: int) -> dict:
+    from payload import parse
+
+    results = {}
+    for name, kwargs in CASES.items():
+        data = make_payload(**kwargs)
+        times = []
+        for _ in range(repeat * 100):
+            start = time.perf_counter()
+            payload = parse(data)
+            times.append(time.perf_counter() - start)
+        results[name] = {
+            'us': round(statistics.median(times) * 1e6, 1),
+            'round_trip': parse(payload.to_json()) == payload,
+            'canonical_bytes': len(payload.canonical()),
+        }
+    return results
+
+def run_readings_case(repeat: int) -> dict:
+    from lectionary import ReadingsStore
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fixtures = [cwd.parent/'readings.json', cwd.parent/'readings2.json']
+        store = ReadingsStore(Path(tmp)/'readings.db', max_cached=0)
+        dates = store.import_files(fixtures)
+        disk = []
+        for _ in range(repeat * 100):
+            start = time.perf_counter()
+            store.get(dates[0])
+            disk.append(time.perf_counter() - start)
+
+        store.max_cached = 512
+        store.get(dates[0])
+        memory = []
+        for _ in range(repeat * 100):
+            start = time.perf_counter()
+            store.get(dates[0])
+            memory.append(time.perf_counter() - start)
+        return {
+            'disk_us': round(statistics.median(disk) * 1e6, 1),
+            'memory_us': round(statistics.median(memory) * 1e6, 2),
+            'stored_bytes': store.stats()['bytes'],
+            'fixture_bytes': sum(f.stat().st_size for f in fixtures),
+        }
+
+def run_transfer_case(repeat: int) -> dict:
+    '''What the editor uploads for a preview after changing one field, and the cost of applying the delta.'''
+    from delta import apply_patch, diff
+    from encoding import compress
+
+    results = {}
+    for name, kwargs in CASES.items():
+        data = make_payload(**kwargs)
+        edited = json.loads(json.dumps(data))
+        edited['front']['title'] += ' (edited)'
+        full = json.dumps(edited).encode('utf-8')
+        patch = diff(data, edited)
+        times = []
+        for _ in range(repeat * 100):
+            start = time.perf_counter()
+            patched = apply_patch(data, patch)
+            times.append(time.perf_counter() - start)
+        results[name] = {
+            'full_bytes': len(full),
+            'gzip_bytes': len(compress(full, 'gzip')),
+            'delta_bytes': len(json.dumps(patch).encode('utf-8')),
+            'apply_us': round(statistics.median(times) * 1e6, 1),
+            'identical': patched == edited,
+        }
+    return results
+
+def wordml_variants() -> dict[str, dict]:
+    '''Every case, plus the layouts the cases do not reach: no title, each mass table shape, the copyright page.'''
+    variants = {name: make_payload(**kwargs) for name, kwargs in CASES.items()}
+    base = load_fixture('test.json')
+    masses = base['front']['mass-info'] * 5
+    for n in range(6):
+        variants[f'mass-{n}'] = payload = json.loads(json.dumps(base))
+        payload['front']['mass-info'] = masses[:n]
+    variants['no-title'] = payload = json.loads(json.dumps(base))
+    payload['front']['title'] = ''
+    variants['copyright-right'] = payload = json.loads(json.dumps(base))
+    payload['readings']['options']['copyright-page'] = 1
+    payload['readings']['options']['dpa-page'] = 0
+    return variants
+
+def run_wordml_case(repeat: int) -> dict:
+    '''
+    Builds every variant with both backends. word/document.xml must be the same XML (compared
+    canonicalized) and every other part byte-identical.
+    '''
+    os.chdir(cwd)
+    from bulletin import build_payload
+    from lxml import etree
+    import tracemalloc
+
+    def canonical(xml: bytes) -> bytes:
+        return etree.tostring(etree.fromstring(xml), method='c14n')
+
+    results = {}
+    for name, payload in wordml_variants().items():
+        result, parts = {}, {}
+        for backend in ('python-docx', 'wordml'):
+            build_payload(payload, io.BytesIO(), incremental=False, backend=backend)
+            times = []
+            for _ in range(repeat):
+                out = io.BytesIO()
+                start = time.perf_counter()
+                build_payload(payload, out, incremental=False, backend=backend)
+                times.append(time.perf_counter() - start)
+            # Python allocations only: the trees python-docx keeps in lxml are not traced
+            tracemalloc.start()
+            build_payload(payload, io.BytesIO(), incremental=False, backend=backend)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            parts[backend] = docx_parts(out.getvalue())
+            result[backend] = {'ms': ms(statistics.median(times)), 'traced_peak_kb': peak // 1024, 'docx_bytes': len(out.getvalue())}
+
+        a, b = parts['python-docx'], parts['wordml']
+        result['speedup'] = round(result['python-docx']['ms'] / result['wordml']['ms'], 1)
+        result['identical'] = list(a) == list(b) and all(
+            canonical(a[part]) == canonical(b[part]) if part == 'word/document.xml' else a[part] == b[part]
+            for part in a
+        )
+        results[name] = result
+    return results
+
+# row counts per section; latest-info is set in 1pt type so 48 rows still fit the page
+SCALING = {'info_rows': (6, 12, 24, 48), 'back_entries': (50, 100, 200, 400)}
+
+def run_scaling_case(repeat: int) -> dict:
+    '''
+    Build time against row count, with both backends. `us_per_row` is the cost of each row added
+    since the previous size, which stays flat when building is linear in the number of rows.
+    '''
+    os.chdir(cwd)
+    from bulletin import build_payload
+
+    results = {}
+    for backend in ('python-docx', 'wordml'):
+        for section, sizes in SCALING.items():
+            points = []
+            for rows in sizes:
+                payload = make_payload(**{section: rows})
+                payload['front']['latest-info-size'] = 1
+                build_payload(payload, io.BytesIO(), incremental=False, backend=backend)
+                times = []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    build_payload(payload, io.BytesIO(), incremental=False, backend=backend)
+                    times.append(time.perf_counter() - start)
+                points.append((rows, statistics.median(times)))
+            results[f'{backend}/{section}'] = {
+                'ms': {rows: ms(t) for rows, t in points},
+                'us_per_row': [round((t - pt) / (rows - prows) * 1e6, 1) for (prows, pt), (rows, t) in zip(points, points[1:])],
+            }
+    return results
+
+def run_tenants_case(repeat: int) -> dict:
+    '''
+    Two parishes with their own logos on one server: how long a build for a quiet parish takes on
+    its own, while a busy one has a backlog of builds queued and when builds alternate between the
+    two, and what the busy parish's rate limit refuses. With
+    the busy parish held to one build at a time, the quiet one should only slow down by the CPU
+    that build takes, not by waiting behind its queue.
+    '''
+    with tempfile.TemporaryDirectory() as tmp:
+        # a logo of its own (the same image, with a byte after its end), so builds switch packages
+        quiet_logo = Path(tmp, 'quiet-logo.png')
+        quiet_logo.write_bytes((cwd/'logo.png').read_bytes() + b'\0')
+        config = {'parishes': {
+            'busy': {'key': 'busy', 'root': str(Path(tmp, 'busy')), 'logo': str(cwd/'logo.png'), 'concurrency': 1, 'queue': 64, 'rate': 1, 'burst': 10},
+            'quiet': {'key': 'quiet', 'root': str(Path(tmp, 'quiet')), 'logo': str(quiet_logo), 'dpa': '<i>Quiet parish</i>'},
+        }}
+        Path(tmp, 'parishes.json').write_text(json.dumps(config), encoding='utf-8')
+        os.environ['PARISHES'] = str(Path(tmp, 'parishes.json'))
+        os.chdir(tmp)
+        import server
+        busy, quiet = server.parishes['busy'], server.parishes['quiet']
+
+        def quiet_builds(seed: int) -> list[float]:
+            times = []
+            for n in range(repeat):
+                start = time.perf_counter()
+                server.ensure_build(quiet, make_payload(back_entries=20, seed=seed + n))
+                times.append(time.perf_counter() - start)
+            return times
+
+        server.ensure_build(quiet, make_payload(back_entries=20))
+        alone = quiet_builds(1000)
+        jobs = [busy.build_jobs.submit(make_payload(back_entries=20, seed=n), f'client-{n}') for n in range(4 * repeat)]
+        backlog = busy.build_jobs.stats()['pending']
+        contended = quiet_builds(2000)
+        for job in jobs:
+            busy.build_jobs.wait(job, 600)
+
+        # each build for the other parish than the one before, logo and all
+        alternating = []
+        for n in range(repeat):
+            for seed, parish in enumerate((busy, quiet)):
+                start = time.perf_counter()
+                server.ensure_build(parish, make_payload(back_entries=20, seed=3000 + 2 * n + seed))
+                alternating.append(time.perf_counter() - start)
+
+        refused = sum(busy.bucket.take() > 0 for _ in range(20))
+    return {
+        'quiet_alone_ms': ms(statistics.median(alone)),
+        'quiet_while_busy_ms': ms(statistics.median(contended)),
+        'alternating_ms': ms(statistics.median(alternating)),
+        'busy_backlog': backlog,
+        'busy_refused_of_20': refused,
+    }
+
+WATCHED_MODULES = ('flask', 'flask_cors', 'docx', 'lxml', 'docx2pdf', 'bulletin', 'markup')
+
+def run_import_case(repeat: int) -> dict:
+    '''Cold `import server` in a new interpreter: what every worker pays before its first request.'''
+    env = {**os.environ, 'API_KEY': os.environ.get('API_KEY', 'bench')}
+    modules = {}
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', 'import server'],
+            cwd=cwd, env=env, capture_output=True, text=True, check=True
+        )
+        for line in result.stderr.splitlines():
+            if not line.startswith('import time:') or '|' not in line or 'cumulative' in line:
+                continue
+            _, cumulative, name = line.split('|')
+            name = name.strip()
+            if name in WATCHED_MODULES or name == 'server':
+                modules.setdefault(name, []).append(int(cumulative) / 1000)
+
+    server = modules.pop('server')
+    return {
+        'server_ms': round(statistics.median(server), 2),
+        'modules_ms': {name: round(statistics.median(times), 2) for name, times in sorted(modules.items())},
+    }
+
+def in_fresh_process(func, *args):
+    with multiprocessing.get_context('spawn').Pool(1, maxtasksperchild=1) as pool:
+        return pool.apply(func, args)
+
+def run(cases: list[str], repeat: int) -> dict:
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'repeat': repeat,
+        'cases': {},
+    }
+    for name in cases:
+        if name == 'parseText':
+            report['cases'][name] = in_fresh_process(run_parse_case, repeat)
+        elif name == 'imports':
+            report['cases'][name] = run_import_case(repeat)
+        elif name == 'preflight':
+            report['cases'][name] = in_fresh_process(run_preflight_case, repeat)
+        elif name == 'incremental':
+            report['cases'][name] = in_fresh_process(run_incremental_case, repeat)
+        elif name == 'payload':
+            report['cases'][name] = in_fresh_process(run_payload_case, repeat)
+        elif name == 'readings':
+            report['cases'][name] = in_fresh_process(run_readings_case, repeat)
+        elif name == 'transfer':
+            report['cases'][name] = in_fresh_process(run_transfer_case, repeat)
+        elif name == 'wordml':
+            report['cases'][name] = in_fresh_process(run_wordml_case, repeat)
+        elif name == 'scaling':
+            report['cases'][name] = in_fresh_process(run_scaling_case, repeat)
+        elif name == 'tenants':
+            report['cases'][name] = in_fresh_process(run_tenants_case, repeat)
+        else:
+            report['cases'][name] = in_fresh_process(run_build_case, CASES[name], repeat)
+        print(f'{name}: done', file=sys.stderr)
+    return report
+
+def compare(old: dict, new: dict, threshold: float) -> bool:
+    '''Prints the median wall time change per case. False if any case regressed past `threshold`.'''
+    ok = True
+    for name, case in new['cases'].items():
+        before = old['cases'].get(name, {}).get('wall_ms', {}).get('median')
+        after = case.get('wall_ms', {}).get('median')
+        if before is None or after is None:
+            continue
+        change = (after - before) / before
+        flag = ''
+        if change > threshold:
+            flag, ok = '  REGRESSION', False
+        print(f'{name:>16}: {before:9.2f}ms -> {after:9.2f}ms ({change:+.1%}){flag}', file=sys.stderr)
+    return ok
+
+def cprofile(name: str, repeat: int) -> None:
+    import cProfile
+    import pstats
+    from bulletin import build_payload
+
+    payload = make_payload(**CASES[name])
+    with tempfile.TemporaryDirectory() as tmp:
+        build_payload(payload, Path(tmp)/'bench.docx', incremental=False)
+        profiler = cProfile.Profile()
+        profiler.enable()
+        for _ in range(repeat):
+            build_payload(payload, Path(tmp)/'bench.docx', incremental=False)
+        profiler.disable()
+
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(30)
+    print(out.getvalue())
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('cases', nargs='*', help=f'cases to run (default: all of {", ".join([*CASES, "parseText", "imports", "incremental", "preflight", "payload", "readings", "transfer", "wordml", "scaling", "tenants"])})')
+    parser.add_argument('-n', '--repeat', type=int, default=5, help='warm runs per case')
+    parser.add_argument('-o', '--output', help='write the JSON report here instead of stdout')
+    parser.add_argument('--compare', metavar='JSON', help='earlier report to compare against')
+    parser.add_argument('--threshold', type=float, default=0.1, help='slowdown that counts as a regression (default 0.1)')
+    parser.add_argument('--cprofile', metavar='CASE', help='print a cProfile of CASE instead of benchmarking')
+    args = parser.parse_args()
+
+    os.chdir(cwd)
+    sys.path.insert(0, str(cwd))
+    if args.cprofile:
+        cprofile(args.cprofile, args.repeat)
+        return
+
+    report = run(args.cases or [*CASES, 'parseText', 'imports', 'incremental', 'preflight', 'payload', 'readings', 'transfer', 'wordml', 'scaling', 'tenants'], args.repeat)
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        Path(args.output).write_text(text + '\n', encoding='utf-8')
+    else:
+        print(text)
+
+    mismatched = [name for name, result in report['cases'].get('incremental', {}).items() if not result['identical']]
+    if mismatched:
+        print(f'incremental rebuild differs from a full one: {", ".join(mismatched)}', file=sys.stderr)
+    diverged = [name for name, result in report['cases'].get('wordml', {}).items() if not result['identical']]
+    if diverged:
+        print(f'wordml writes a different document from python-docx: {", ".join(diverged)}', file=sys.stderr)
+    if mismatched or diverged:
+        sys.exit(1)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            if not compare(json.load(f), report, args.threshold):
+                sys.exit(1)
+
+if __name__ == '__main__':
+    main()
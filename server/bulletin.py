@@ -1,6 +1,12 @@
-import re
-
+import os
 import math
+from copy import deepcopy
+from collections import OrderedDict
+from functools import lru_cache
+import threading
+import gc
+import hashlib
+from typing import IO
 from docx import Document
 from docx.shared import Mm, Pt
 from docx.enum.section import WD_ORIENTATION, WD_SECTION
@@ -9,18 +15,26 @@ from docx.enum.table import WD_ROW_HEIGHT_RULE, WD_CELL_VERTICAL_ALIGNMENT
 
 from docx.oxml import OxmlElement
 from docx.oxml.ns import qn
+from docx.oxml.shape import CT_Inline
+from docx.text.paragraph import Paragraph
+from docx.text.run import Run
+
+from cache import file_hash
+from markup import compile_markup
+from payload import InfoGroup, Notice, Payload, Reading, parse
+from readings import COPYRIGHT, DPA_NOTICE, reading_texts
+from timing import count, lap
 
 GLOBAL_PATH: str = '' # '/home/bulletins/mysite/'
 GLOBAL_FONT: str = 'Calibri'
+# 'wordml' writes document.xml directly (wordml.py); 'python-docx' builds it through python-docx
+DOCX_BACKEND: str = os.getenv('DOCX_BACKEND', 'wordml')
 
 fancyq = {
     "'": ('\u2018', '\u2019'),
     '"': ('\u201C', '\u201D')
 }
 
-def format_linebreaks(text: str) -> str:
-    return re.sub(r'(?<=<br>)(?=<br>)', '\u2800', text)
-
 def set_table_borders(table, color='000000', size=4, outer=True):
     tblBorders = OxmlElement('w:tblBorders')
     for border_name in (*(['top', 'left', 'bottom', 'right'] if outer else []), 'insideH', 'insideV'):
@@ -70,14 +84,15 @@ def set_cell_background(cell, color: str='000000'):
     shd.set(qn('w:fill'), color)
 
 def zero_paragraph_spacing(cell):
-    for p in cell.paragraphs:
-        p.paragraph_format.space_before = 0
-        p.paragraph_format.space_after = 0
-        p.paragraph_format.line_spacing = 1
+    for p in cell._tc.iterchildren(qn('w:p')):
+        fmt = Paragraph(p, cell).paragraph_format
+        fmt.space_before = 0
+        fmt.space_after = 0
+        fmt.line_spacing = 1
 
 def normalize_cell(cell, margins=True, paragraph_spacing=True):
     '''Warning: Doesn't work on empty cells.'''
-    cell._tc.remove(cell.paragraphs[0]._p)
+    cell._tc.remove(cell._tc.find(qn('w:p')))
     if margins: set_cell_margins(cell, 0, 0, 0, 0)
     if paragraph_spacing: zero_paragraph_spacing(cell)
 
@@ -95,106 +110,110 @@ def p_has_image(p):
             return True
     return False
 
-def remove_blank_p(cell):
-    paragraphs = list(cell.paragraphs)
-    for p in paragraphs:
-        if not p.text.strip() and not p_has_image(p):
-            if len(cell.paragraphs) > 1:
-                p._element.getparent().remove(p._element)
+def p_is_blank(p):
+    return not p.text.strip() and not p_has_image(p)
 
-def safe_normalize_page(left: bool, check: list[bool, bool], table) -> None:
+def remove_blank_p(cell):
+    '''Removes the blank paragraphs of `cell` in one pass, leaving the last if they all are.'''
+    paragraphs = cell.paragraphs
+    blank = [p for p in paragraphs if p_is_blank(p)]
+    if len(blank) == len(paragraphs):
+        blank = blank[:-1]
+    for p in blank:
+        cell._tc.remove(p._p)
+
+def safe_normalize_page(left: bool, check: list[bool, bool], cells) -> None:
     if not check[0 if left else 1]:
-        normalize_cell(table.cell(0, 0 if left else 2))
+        normalize_cell(cells[0 if left else 2])
         check[0 if left else 1] = True
 
-def add_run(p, txt, size, ctx):
-    run = p.add_run(txt)
+@lru_cache(maxsize=512)
+def run_properties(size, font, flags):
+    '''`w:rPr` for a run, built once through python-docx and deep-copied into every new run.'''
+    run = Run(OxmlElement('w:r'), None)
     run.font.size = Pt(size)
-    run.font.name = GLOBAL_FONT
-    for tag in ctx:
-        if tag == 'b':
+    run.font.name = font
+    for flag in flags:
+        if flag == 'b':
             run.bold = True
-        elif tag == 'i':
+        elif flag == 'i':
             run.italic = True
-        elif tag == 'u':
+        elif flag == 'u':
             run.underline = True
-        elif tag == 's':
+        elif flag == 's':
             run.font.superscript = True
-
-def parseText(obj, raw_text, size, spacing, ptop=0, pbottom=0, center=False, left_right=None):
-    valid_tags = [
-        'br', '_tab',
-        'b', 'i', 'u', 's', 'ul',
-        '/b', '/i', '/u', '/s', '/ul'
-    ]
-
-    text = format_linebreaks(raw_text.replace('<br><ul>', '<ul>').replace('</ul><br>', '</ul>'))
-    p = obj.add_paragraph()
+    return run._r.rPr
+
+def add_run(p, txt, size, flags):
+    r = p._p.add_r()
+    if flags is not None:
+        r.append(deepcopy(run_properties(size, GLOBAL_FONT, flags)))
+    if txt:
+        r.text = txt
+
+_paragraph_properties = {}
+
+def paragraph_properties(obj, kind, spacing, top=0, bottom=0, center=False, left_right=None):
+    '''`w:pPr` for a parseText paragraph, built once per distinct layout and deep-copied.'''
+    if kind != 'first':
+        top, left_right = 0, None
+    key = (kind, spacing, top, bottom, center, left_right)
+    pPr = _paragraph_properties.get(key)
+    if pPr is not None:
+        return pPr
+
+    p = Paragraph(OxmlElement('w:p'), obj)
+    if kind == 'bullet': p.style = "List Bullet"
     if center: p.alignment = WD_ALIGN_PARAGRAPH.CENTER
     if left_right is not None:
         p.paragraph_format.tab_stops.add_tab_stop(
             left_right,
             WD_ALIGN_PARAGRAPH.RIGHT
         )
-    normalize_p(p, size, spacing, ptop, 0)
-
-    ctx, intag, txt = [], None, ''
-    for c in text:
-        if c == '<':
-            if intag:
-                txt += '<'+intag
-            intag = ''
-        elif c == '>' and intag:
-            if txt:
-                add_run(p, txt, size, ctx)
-                txt = ''
-
-            if intag not in valid_tags:
-                add_run(p, '<'+intag+'>', size, ctx)
-            elif 'ul' in intag or (ctx and ctx[-1] == 'ul'):
-                if intag == '/ul':
-                    ctx = ctx[:-1]
-                    p = obj.add_paragraph()
-                    if center: p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                    normalize_p(p, size, spacing)
-                elif intag == 'ul' or intag == 'br':
-                    if intag == 'ul':
-                        ctx.append('ul')
-                    p = obj.add_paragraph(style="List Bullet")
-                    if center: p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                    normalize_p(p, size, spacing)
-                    fmt = p.paragraph_format
-                    n = 16
-                    m = 1.5
-
-                    fmt.left_indent = Pt(n*m)
-                    fmt.first_line_indent = -Pt(n)
-            else:
-                if intag.startswith('/') and intag[1:] in ctx:
-                    ctx = ctx[::-1]
-                    ctx.remove(intag[1:])
-                    ctx = ctx[::-1]
-                elif intag == 'br':
-                    p = obj.add_paragraph()
-                    if center: p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                    normalize_p(p, size, spacing)
-                elif left_right is not None and intag == '_tab':
-                    p.add_run('\t')
-                else:
-                    ctx.append(intag)
-
-            intag = None
-        else:
-            if intag is not None:
-                intag += c
-            else:
-                txt += c
-
-    add_run(p, txt, size, ctx)
-    if intag: add_run(p, '<'+intag, size, ctx)
+    normalize_p(p, 1, spacing, top, bottom)
+    if kind == 'bullet':
+        fmt = p.paragraph_format
+        n = 16
+        m = 1.5
+
+        fmt.left_indent = Pt(n*m)
+        fmt.first_line_indent = -Pt(n)
+
+    if len(_paragraph_properties) >= 512:
+        _paragraph_properties.clear()
+    pPr = _paragraph_properties[key] = p._p.pPr
+    return pPr
+
+def add_paragraph(obj, kind, size, spacing, top=0, bottom=0, center=False, left_right=None):
+    p = obj._element.add_p()
+    p.append(deepcopy(paragraph_properties(obj, kind, spacing, top, bottom, center, left_right)))
+    return Paragraph(p, obj)
+
+def render_markup(obj, paragraphs, size, spacing, ptop=0, pbottom=0, center=False, left_right=None):
+    count('paragraphs', len(paragraphs))
+    for n, (kind, runs, _) in enumerate(paragraphs):
+        count('runs', len(runs))
+        p = add_paragraph(obj, kind, size, spacing, ptop, pbottom if n == len(paragraphs) - 1 else 0, center, left_right)
+        for txt, flags in runs:
+            add_run(p, txt, size, flags)
 
-    p.paragraph_format.space_after = Pt(pbottom)
-    remove_blank_p(obj)
+def parseText(obj, raw_text, size, spacing, ptop=0, pbottom=0, center=False, left_right=None):
+    count('parseText')
+    paragraphs = compile_markup(raw_text, left_right is not None)
+
+    # Blank paragraphs are dropped unless they would leave the cell empty, in which case only the
+    # last one stays. Earlier calls leave at most one blank paragraph, always first in the cell.
+    keep = [p for p in paragraphs if not p.blank]
+    first = obj._element.find(qn('w:p'))
+    if first is not None and p_is_blank(Paragraph(first, obj)):
+        first.getparent().remove(first)
+        first = obj._element.find(qn('w:p'))
+    if not keep and first is None:
+        keep = paragraphs[-1:]
+
+    if keep and keep[-1] is not paragraphs[-1]:
+        pbottom = 0
+    render_markup(obj, keep, size, spacing, ptop, pbottom, center, left_right)
 
 def get_row_height(row):
     row_height = row._tr.trPr.trHeight
@@ -211,10 +230,181 @@ def cellMargin(val: int | float) -> int | float:
 def toCellMargin(val: int | float) -> int | float:
     return val / 350
 
+class Skeleton:
+    '''
+    Everything in a document that only depends on the page margins and the logo: styles, both
+    sections, the empty `a5table` and `reading_table` and the embedded logo image. Built documents
+    are recycled by restoring the pristine body, so `Document()` only runs once per skeleton.
+    '''
+
+    def __init__(self, front_page_margins, reading_margins, logo_path):
+        self.front_page_margins = front_page_margins
+        self.reading_margins = reading_margins
+        self.logo_path = logo_path
+        self.free = []
+        # section name -> (fingerprint, rendered w:tc of each of its cells) from the last build
+        self.sections = {}
+
+        doc = self.new_document()
+        self.pristine = deepcopy(doc.element.body)
+        self.free.append(doc)
+
+    def new_document(self):
+        front_page_margins, reading_margins = self.front_page_margins, self.reading_margins
+
+        doc = Document()
+
+        style = doc.styles['Normal']
+        style.paragraph_format.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
+
+        section = doc.sections[0]
+        section.orientation = WD_ORIENTATION.LANDSCAPE
+        section.page_width = Mm(297)
+        section.page_height = Mm(210)
+
+        margins = Mm(front_page_margins[0]), Mm(front_page_margins[1])
+
+        section.top_margin = round(margins[0] * 0.8)
+        section.bottom_margin = round(margins[0] * 0.8)
+        section.left_margin = round(margins[1] * 0.8)
+        section.right_margin = round(margins[1] * 1.3)
+        middle_margin = (margins[1] * .9, margins[1] * .4)
+
+        left_half_width = round(
+            (section.page_width / 2)
+            - section.left_margin
+            - (middle_margin[0] / 2)
+        )
+        right_half_width = round(
+            (section.page_width / 2)
+            - section.right_margin
+            - (middle_margin[1] / 2)
+        )
+        a5table = doc.add_table(rows=1, cols=3)
+        a5table.autofit = False
+        a5table.allow_autofit = False
+
+        a5table.rows[0].height = section.page_height - section.top_margin - section.bottom_margin
+        a5table.rows[0].height_rule = WD_ROW_HEIGHT_RULE.EXACTLY
+
+        a5table.cell(0, 0).width = int(left_half_width)
+        a5table.columns[0].width = int(left_half_width)
+        a5table.cell(0, 1).width = int(sum(middle_margin))
+        a5table.columns[1].width = int(sum(middle_margin))
+        a5table.cell(0, 2).width = int(right_half_width)
+        a5table.columns[2].width = int(right_half_width)
+
+        remove_cell_borders(a5table.cell(0, 1))
+        normalize_cell(a5table.cell(0, 0))
+        normalize_cell(a5table.cell(0, 2))
+
+        set_table_borders(a5table, '000000', 4, True)
+        front_widths = left_half_width, right_half_width
+
+        section2 = doc.add_section(WD_SECTION.NEW_PAGE)
+
+        reading_top_margin = Mm(reading_margins[0])
+        reading_margin = Mm(reading_margins[1])
+
+        section2.top_margin = reading_top_margin
+        section2.bottom_margin = 0
+        section2.left_margin = round(reading_margin * 0.8)
+        section2.right_margin = round(reading_margin * 1.3)
+        middle_margin = (reading_margin * .9, reading_margin * .4)
+
+        left_half_width = round(
+            (section2.page_width / 2)
+            - section2.left_margin
+            - (middle_margin[0] / 2)
+        )
+        right_half_width = round(
+            (section2.page_width / 2)
+            - section2.right_margin
+            - (middle_margin[1] / 2)
+        )
+
+        reading_table = doc.add_table(rows=1, cols=3)
+        reading_table.autofit = False
+        reading_table.allow_autofit = False
+        reading_table.rows[0].height = section2.page_height - reading_top_margin - Mm(8)
+        reading_table.rows[0].height_rule = WD_ROW_HEIGHT_RULE.EXACTLY
+
+        reading_table.cell(0, 0).width = int(left_half_width)
+        reading_table.columns[0].width = int(left_half_width)
+        reading_table.cell(0, 1).width = int(sum(middle_margin))
+        reading_table.columns[1].width = int(sum(middle_margin))
+        reading_table.cell(0, 2).width = int(right_half_width)
+        reading_table.columns[2].width = int(right_half_width)
+
+        remove_cell_borders(reading_table.cell(0, 1))
+
+        self.front_widths = front_widths
+        self.reading_widths = left_half_width, right_half_width
+
+        rId, image = doc.part.get_or_add_image(self.logo_path)
+        cx, cy = image.scaled_dimensions(Mm(54), None)
+        self.logo = rId, image.filename, cx, cy
+
+        return doc
+
+    def checkout(self):
+        with _skeletons_lock:
+            doc = self.free.pop() if self.free else None
+        if doc is None:
+            return self.new_document()
+
+        # python-docx proxies from the last build sit in reference cycles, and lxml moves (rather
+        # than frees) any node a live proxy still points at, so collect them before clearing
+        gc.collect(1)
+        body = doc.element.body
+        body.clear()
+        body.extend(deepcopy(self.pristine))
+        return doc
+
+    def cached_section(self, name, fingerprint):
+        with _skeletons_lock:
+            entry = self.sections.get(name)
+        if entry is None or entry[0] != fingerprint:
+            return None
+        return [deepcopy(tc) for tc in entry[1]]
+
+    def store_section(self, name, fingerprint, tcs):
+        copies = [deepcopy(tc) for tc in tcs]
+        with _skeletons_lock:
+            self.sections[name] = fingerprint, copies
+
+    def release(self, doc):
+        with _skeletons_lock:
+            if len(self.free) < 4:
+                self.free.append(doc)
+
+_skeletons: OrderedDict[tuple, Skeleton] = OrderedDict()
+_skeletons_lock = threading.Lock()
+
+def checkout_skeleton(front_page_margins, reading_margins, logo_path):
+    key = (tuple(front_page_margins), tuple(reading_margins), file_hash(logo_path))
+    with _skeletons_lock:
+        skel = _skeletons.get(key)
+        if skel is not None:
+            _skeletons.move_to_end(key)
+    if skel is None:
+        skel = Skeleton(front_page_margins, reading_margins, logo_path)
+        with _skeletons_lock:
+            _skeletons[key] = skel
+            while len(_skeletons) > 8:
+                _skeletons.popitem(last=False)
+
+    return skel.checkout(), skel
+
+def add_logo(p, skel):
+    rId, filename, cx, cy = skel.logo
+    inline = CT_Inline.new_pic_inline(p.part.next_id, rId, filename, cx, cy)
+    p.add_run()._r.add_drawing(inline)
+
 def build(
-    OUTPUT_PATH: str,
+    OUTPUT_PATH: str | IO[bytes],
     front_page_margins: tuple[int | float, int | float],
-    info_data: list[tuple[int, str]],
+    info_data: tuple[InfoGroup, ...],
     info_size: int | float,
     info_side_width: int | float,
     title: str,
@@ -223,293 +413,268 @@ def build(
     church_title_size: int | float,
     church_info: str,
     church_info_size: int | float,
-    mass_info: list[str],
+    mass_info: tuple[str, ...],
     mass_info_size: int | float,
-    data: list[tuple[int | float, int | float, str]],
-    readings: dict,
+    data: tuple[Notice, ...],
+    readings: tuple[Reading, ...],
     reading_margins: tuple[int | float, int | float],
     reading_heading_spacing: int | float,
     reading_heading_size: int | float,
     copyright_size: int | float,
     copyright_spacing: int | float,
     copyright_page: int,
-    dpa_page: int
+    dpa_page: int,
+    logo: str | None = None,
+    copyright: str = COPYRIGHT,
+    dpa_notice: str = DPA_NOTICE,
+    incremental: bool = True
 ):
-    doc = Document()
+    '''
+    Writes the bulletin to OUTPUT_PATH. `logo` (GLOBAL_PATH/logo.png by default), `copyright` and
+    `dpa_notice` are the parish's own, the same in every issue.
+    '''
+    lap()
+    doc, skel = checkout_skeleton(front_page_margins, reading_margins, logo or os.path.join(GLOBAL_PATH, 'logo.png'))
+    a5table, reading_table = doc.tables
+    left_half_width, right_half_width = skel.front_widths
+
+    # each section only renders into its own cells, so a section whose inputs are unchanged
+    # since the last build on this skeleton gets its cells spliced in from that build
+    section_inputs = {
+        'front': (info_data, info_size, info_side_width, title, title_size, church_title, church_title_size,
+            church_info, church_info_size, mass_info, mass_info_size),
+        'back': data,
+        'readings': (readings, reading_heading_spacing, reading_heading_size, copyright_size, copyright_spacing,
+            copyright_page, dpa_page, copyright, dpa_notice),
+    }
+    section_cells = {
+        'front': lambda: [a5table.cell(0, 2)._tc],
+        'back': lambda: [a5table.cell(0, 0)._tc],
+        'readings': lambda: [reading_table.cell(0, 0)._tc, reading_table.cell(0, 2)._tc],
+    }
+    # the inputs are frozen dataclasses, tuples and scalars, whose repr is exact and stable
+    fingerprints = {name: hashlib.sha256(repr(inputs).encode()).hexdigest() for name, inputs in section_inputs.items()}
+    rendered = set()
+    for name, fingerprint in fingerprints.items():
+        cached = skel.cached_section(name, fingerprint) if incremental else None
+        if cached is None:
+            rendered.add(name)
+            continue
+        for old, new in zip(section_cells[name](), cached):
+            old.getparent().replace(old, new)
+        count('cached sections')
+    lap('skeleton')
 
-    style = doc.styles['Normal']
-    style.paragraph_format.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
+    if 'front' in rendered:
+        info_rows = sum(len(group.lines) + 1 for group in info_data)
 
-    section = doc.sections[0]
-    section.orientation = WD_ORIENTATION.LANDSCAPE
-    section.page_width = Mm(297)
-    section.page_height = Mm(210)
+        info_table = a5table.cell(0, 2).add_table(rows=len(info_data) + 1, cols=1)
+        info_table.autofit = True
+        info_table.allow_autofit = True
 
-    margins = Mm(front_page_margins[0]), Mm(front_page_margins[1])
+        side_width = info_side_width / 100
 
-    section.top_margin = round(margins[0] * 0.8)
-    section.bottom_margin = round(margins[0] * 0.8)
-    section.left_margin = round(margins[1] * 0.8)
-    section.right_margin = round(margins[1] * 1.3)
-    middle_margin = (margins[1] * .9, margins[1] * .4)
+        # row and cell proxies are fetched once: every python-docx lookup walks the whole table
+        front_row, *group_rows = info_table.rows
 
-    left_half_width = round(
-        (section.page_width / 2)
-        - section.left_margin
-        - (middle_margin[0] / 2)
-    )
-    right_half_width = round(
-        (section.page_width / 2)
-        - section.right_margin
-        - (middle_margin[1] / 2)
-    )
-    a5table = doc.add_table(rows=1, cols=3)
-    a5table.autofit = False
-    a5table.allow_autofit = False
-
-    a5table.rows[0].height = section.page_height - section.top_margin - section.bottom_margin
-    a5table.rows[0].height_rule = WD_ROW_HEIGHT_RULE.EXACTLY
-
-    a5table.cell(0, 0).width = int(left_half_width)
-    a5table.columns[0].width = int(left_half_width)
-    a5table.cell(0, 1).width = int(sum(middle_margin))
-    a5table.columns[1].width = int(sum(middle_margin))
-    a5table.cell(0, 2).width = int(right_half_width)
-    a5table.columns[2].width = int(right_half_width)
-
-    remove_cell_borders(a5table.cell(0, 1))
-    normalize_cell(a5table.cell(0, 0))
-    normalize_cell(a5table.cell(0, 2))
-
-    set_table_borders(a5table, '000000', 4, True)
-
-    info_rows = 0
-    for t in info_data:
-        info_rows += len(t)
-    
-    info_table = a5table.cell(0, 2).add_table(rows=len(info_data) + 1, cols=1)
-    info_table.autofit = True
-    info_table.allow_autofit = True
-
-    side_width = info_side_width / 100
-
-    total, n = 0, 0
-    for m, ((side_size, side), *info) in enumerate(info_data):
-        trow = info_table.rows[1:][m]
-        normalize_cell(trow.cells[0])
-        ttable = trow.cells[0].add_table(rows=len(info), cols=2 if side else 1)
-
-        cell_margin = 70
-
-        if side:
-            ttable.columns[0].width = int(right_half_width * (1-side_width))
-            ttable.columns[1].width = int(right_half_width * side_width)
-        else:
-            ttable.columns[0].width = int(right_half_width)
+        total, n = 0, 0
+        for group, trow in zip(info_data, group_rows):
+            side_size, side, info = group.side_size, group.side, group.lines
+            tcell = trow.cells[0]
+            normalize_cell(tcell)
+            ttable = tcell.add_table(rows=len(info), cols=2 if side else 1)
+
+            cell_margin = 70
+
+            if side:
+                ttable.columns[0].width = int(right_half_width * (1-side_width))
+                ttable.columns[1].width = int(right_half_width * side_width)
+            else:
+                ttable.columns[0].width = int(right_half_width)
         
-        for tm, (align, lines, txt) in enumerate(info):
-            row = ttable.rows[tm]
-            normalize_cell(row.cells[0], margins=False)
+            rows = ttable.rows
+            for line, row in zip(info, rows):
+                align, lines, txt = line.align, line.lines, line.text
+                cells = row.cells
+                normalize_cell(cells[0], margins=False)
             
-            set_cell_margins(row.cells[0], cell_margin, 80, cell_margin, 80)
-            height = Pt(info_size * 1.22 * lines) + cellMargin(2 * cell_margin)
-            if n != info_rows - 1:
-                row.height = height
-                row.height_rule = WD_ROW_HEIGHT_RULE.EXACTLY
-            row.cells[0].width = right_half_width * (1-side_width) if side else right_half_width
-            parseText(row.cells[0], txt, info_size, 1, center=align == 1)
-
-            total += height + cellMargin(2 * cell_margin)
-            n += 1
-
-        if side:
-            merged = ttable.cell(0, 1)
-            for row in range(1, len(ttable.rows)):
-                merged = merged.merge(ttable.cell(row, 1))
-
-            normalize_cell(merged, margins=False)
-            set_cell_margins(merged, cell_margin, 80, cell_margin, 80)
-            merged.width = right_half_width * side_width
-
-            parseText(merged, side, side_size, 1, center=True)
-
-        set_table_borders(ttable, '000000', 4, False)
-
-    info_table.rows[0].height = a5table.rows[0].height - total
-    front_page = info_table.rows[0].cells[0]
-
-    set_table_borders(info_table, '000000', 4, False)
-
-    normalize_cell(front_page)
-    parseText(front_page, title.replace('\n', ''), title_size, 1.3, 20, center=True)
-
-    logop = front_page.add_paragraph()
-    logop.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    normalize_p(logop, 1, 1, 5, 0)
-    logop.add_run().add_picture(GLOBAL_PATH+'logo.png', width=Mm(54))
-
-    parseText(front_page, church_title.replace('\n', ''), church_title_size, 1.2, 13, center=True)
-    parseText(front_page, church_info.replace('\n', ''), church_info_size, 1.2, 2, center=True)
-
-    mass_info = [i.replace('\n', '') for i in mass_info]
-
-    if mass_info:
-        match len(mass_info):
-            case 1:
-                mass_table = front_page.add_table(rows=1, cols=1)
-                mass_table_cells = [mass_table.cell(0, 0)]
-            case 2:
-                mass_table = front_page.add_table(rows=1, cols=2)
-                mass_table_cells = [mass_table.cell(0, 0), mass_table.cell(0, 1)]
-            case 3:
-                mass_table = front_page.add_table(rows=2, cols=2)
-                mass_table_cells = [mass_table.cell(0, 0), mass_table.cell(1, 0), mass_table.cell(0, 1).merge(mass_table.cell(1, 1))]
-            case 4:
-                mass_table = front_page.add_table(rows=2, cols=2)
-                mass_table_cells = [mass_table.cell(0, 0), mass_table.cell(1, 0), mass_table.cell(0, 1), mass_table.cell(1, 1)]
-            case _:
-                cols = math.ceil(len(mass_info) / 2)
-                mass_table = front_page.add_table(rows=2, cols=cols)
-                mass_table_cells = [mass_table.cell(i, n) for n in range(cols) for i in (0, 1)]
-
-        for cell, txt in zip(mass_table_cells, mass_info):
+                set_cell_margins(cells[0], cell_margin, 80, cell_margin, 80)
+                height = Pt(info_size * 1.22 * lines) + cellMargin(2 * cell_margin)
+                if n != info_rows - 1:
+                    row.height = height
+                    row.height_rule = WD_ROW_HEIGHT_RULE.EXACTLY
+                cells[0].width = right_half_width * (1-side_width) if side else right_half_width
+                parseText(cells[0], txt, info_size, 1, center=align == 1)
+
+                total += height + cellMargin(2 * cell_margin)
+                n += 1
+
+            if side:
+                # one merge from the top cell to the bottom one, not one per row
+                merged = rows[0].cells[1]
+                if len(rows) > 1:
+                    merged = merged.merge(rows[-1].cells[1])
+
+                normalize_cell(merged, margins=False)
+                set_cell_margins(merged, cell_margin, 80, cell_margin, 80)
+                merged.width = right_half_width * side_width
+
+                parseText(merged, side, side_size, 1, center=True)
+
+            set_table_borders(ttable, '000000', 4, False)
+
+        lap('info')
+
+        front_row.height = a5table.rows[0].height - total
+        front_page = front_row.cells[0]
+
+        set_table_borders(info_table, '000000', 4, False)
+
+        normalize_cell(front_page)
+        parseText(front_page, title, title_size, 1.3, 20, center=True)
+
+        logop = front_page.add_paragraph()
+        logop.alignment = WD_ALIGN_PARAGRAPH.CENTER
+        normalize_p(logop, 1, 1, 5, 0)
+        add_logo(logop, skel)
+
+        parseText(front_page, church_title, church_title_size, 1.2, 13, center=True)
+        parseText(front_page, church_info, church_info_size, 1.2, 2, center=True)
+
+        if mass_info:
+            match len(mass_info):
+                case 1:
+                    mass_table = front_page.add_table(rows=1, cols=1)
+                    mass_table_cells = mass_table.rows[0].cells
+                case 2:
+                    mass_table = front_page.add_table(rows=1, cols=2)
+                    mass_table_cells = mass_table.rows[0].cells
+                case 3:
+                    mass_table = front_page.add_table(rows=2, cols=2)
+                    top, bottom = (row.cells for row in mass_table.rows)
+                    mass_table_cells = [top[0], bottom[0], top[1].merge(bottom[1])]
+                case 4:
+                    mass_table = front_page.add_table(rows=2, cols=2)
+                    top, bottom = (row.cells for row in mass_table.rows)
+                    mass_table_cells = [top[0], bottom[0], top[1], bottom[1]]
+                case _:
+                    cols = math.ceil(len(mass_info) / 2)
+                    mass_table = front_page.add_table(rows=2, cols=cols)
+                    top, bottom = (row.cells for row in mass_table.rows)
+                    mass_table_cells = [cells[n] for n in range(cols) for cells in (top, bottom)]
+
+            for cell, txt in zip(mass_table_cells, mass_info):
+                normalize_cell(cell, margins=False)
+                cell.vertical_alignment = WD_CELL_VERTICAL_ALIGNMENT.CENTER
+
+                set_cell_margins(cell, 150, 0, 50, 0)
+                parseText(cell, txt, mass_info_size, 1, center=True)
+
+            # set_table_borders(mass_table, '000000', 4, False)
+
+        lap('front')
+
+    if 'back' in rendered:
+        data_table = a5table.cell(0, 0).add_table(rows=len(data), cols=1)
+        data_table.autofit = True
+        data_table.allow_autofit = True
+
+        for notice, row in zip(data, data_table.rows):
+            size, vmargin, txt = notice.size, notice.margin, notice.text
+            cell = row.cells[0]
             normalize_cell(cell, margins=False)
-            cell.vertical_alignment = WD_CELL_VERTICAL_ALIGNMENT.CENTER
-
-            set_cell_margins(cell, 150, 0, 50, 0)
-            parseText(cell, txt, mass_info_size, 1, center=True)
-
-        # set_table_borders(mass_table, '000000', 4, False)
-
-    data = [(i[0], i[1], i[2].replace('\n', '')) for i in data]
-
-    data_table = a5table.cell(0, 0).add_table(rows=len(data), cols=1)
-    data_table.autofit = True
-    data_table.allow_autofit = True
-
-    for (size, vmargin, txt), row in zip(data, data_table.rows):
-        normalize_cell(row.cells[0], margins=False)
-        margin = toCellMargin(Mm(vmargin))
-        set_cell_margins(row.cells[0], margin, 80, margin, 80)
-        row.cells[0].width = left_half_width
-        parseText(row.cells[0], txt, size, 1)
-
-    set_table_borders(data_table, color='000000', size=4, outer=False)
+            margin = toCellMargin(Mm(vmargin))
+            set_cell_margins(cell, margin, 80, margin, 80)
+            cell.width = left_half_width
+            parseText(cell, txt, size, 1)
+
+        set_table_borders(data_table, color='000000', size=4, outer=False)
+
+        lap('back')
+
+    if 'readings' in rendered:
+        left_half_width, right_half_width = skel.reading_widths
+
+        pages = reading_table.rows[0].cells
+        reading_page_normalized = [False, False]
+        for left, text, size, pbottom, heading in reading_texts(readings, reading_heading_size, reading_heading_spacing):
+            safe_normalize_page(left, reading_page_normalized, pages)
+            parseText(pages[0 if left else 2], text, size, 1, pbottom=pbottom,
+                left_right=(left_half_width if left else right_half_width) if heading else None)
+
+        safe_normalize_page(copyright_page == 0, reading_page_normalized, pages)
+        safe_normalize_page(dpa_page == 0, reading_page_normalized, pages)
+
+        parseText(pages[0 if copyright_page == 0 else 2], copyright, copyright_size, 1, pbottom=copyright_spacing)
+        parseText(pages[0 if dpa_page == 0 else 2], dpa_notice, copyright_size, 1)
+
+        lap('readings')
+
+    for name in rendered:
+        skel.store_section(name, fingerprints[name], section_cells[name]())
+
+    # a path, or any writable file: an HTTP response, stdout, a member of an outer archive
+    doc.save(OUTPUT_PATH if hasattr(OUTPUT_PATH, 'write') else os.path.join(GLOBAL_PATH, OUTPUT_PATH))
+    skel.release(doc)
+    lap('save')
+
+def build_payload(data: dict | Payload, OUTPUT_PATH, incremental=True, backend=None, logo=None, copyright=COPYRIGHT, dpa_notice=DPA_NOTICE):
+    '''
+    `build()` from an editor payload (the JSON posted to /build), checked by `payload.parse` first.
+    `backend` picks the writer, DOCX_BACKEND by default.
+    '''
+    payload = parse(data)
+    front, options = payload.front, payload.options
+    backend = backend or DOCX_BACKEND
+    if backend == 'wordml':
+        from wordml import build as write
+    elif backend == 'python-docx':
+        write = build
+    else:
+        raise ValueError(f'Unknown DOCX backend {backend!r}')
+    write(
+        OUTPUT_PATH=OUTPUT_PATH if hasattr(OUTPUT_PATH, 'write') else str(OUTPUT_PATH),
+        front_page_margins=(front.top_margin, front.left_margin),
+        info_data=front.latest_info,
+        info_size=front.latest_info_size,
+        info_side_width=front.latest_info_side_width,
+        title=front.title,
+        title_size=front.title_size,
+        church_title=front.church_title,
+        church_title_size=front.church_title_size,
+        church_info=front.church_info,
+        church_info_size=front.church_info_size,
+        mass_info=front.mass_info,
+        mass_info_size=front.mass_info_size,
+        data=payload.back,
+        readings=payload.readings,
+        reading_margins=(options.top_margin, options.left_margin),
+        reading_heading_spacing=options.heading_spacing,
+        reading_heading_size=options.heading_size,
+        copyright_size=options.copyright_size,
+        copyright_spacing=options.copyright_spacing,
+        copyright_page=options.copyright_page,
+        dpa_page=options.dpa_page,
+        logo=logo,
+        copyright=copyright,
+        dpa_notice=dpa_notice,
+        incremental=incremental,
+    )
 
-    section2 = doc.add_section(WD_SECTION.NEW_PAGE)
+def main():
+    import argparse
+    import json
+    import sys
 
-    reading_top_margin = Mm(reading_margins[0])
-    reading_margin = Mm(reading_margins[1])
+    parser = argparse.ArgumentParser(description='Build a bulletin from an editor payload.')
+    parser.add_argument('payload', nargs='?', default='test.json', help='payload JSON (default: test.json)')
+    parser.add_argument('-o', '--output', default='output.docx', help='where to write the DOCX, - for stdout (default: output.docx)')
+    args = parser.parse_args()
 
-    section2.top_margin = reading_top_margin
-    section2.bottom_margin = 0
-    section2.left_margin = round(reading_margin * 0.8)
-    section2.right_margin = round(reading_margin * 1.3)
-    middle_margin = (reading_margin * .9, reading_margin * .4)
+    with open(args.payload, encoding='utf-8') as f:
+        data = json.load(f)
 
-    left_half_width = round(
-        (section2.page_width / 2)
-        - section2.left_margin
-        - (middle_margin[0] / 2)
-    )
-    right_half_width = round(
-        (section2.page_width / 2)
-        - section2.right_margin
-        - (middle_margin[1] / 2)
-    )
+    build_payload(data, sys.stdout.buffer if args.output == '-' else args.output)
 
-    reading_table = doc.add_table(rows=1, cols=3)
-    reading_table.autofit = False
-    reading_table.allow_autofit = False
-    reading_table.rows[0].height = section2.page_height - reading_top_margin - Mm(8)
-    reading_table.rows[0].height_rule = WD_ROW_HEIGHT_RULE.EXACTLY
-
-    reading_table.cell(0, 0).width = int(left_half_width)
-    reading_table.columns[0].width = int(left_half_width)
-    reading_table.cell(0, 1).width = int(sum(middle_margin))
-    reading_table.columns[1].width = int(sum(middle_margin))
-    reading_table.cell(0, 2).width = int(right_half_width)
-    reading_table.columns[2].width = int(right_half_width)
-
-    remove_cell_borders(reading_table.cell(0, 1))
-
-    reading_types = {
-        'reading1': 'FIRST READING',
-        'psalm': 'RESPONSORIAL PSALM',
-        'reading2': 'SECOND READING',
-        'acclamation': 'GOSPEL ACCLAMATION',
-        'gospel': 'GOSPEL'
-    }
-
-    reading_page_normalized = [False, False]
-    shown_types = []
-    for reading in readings:
-        if not reading.get('include', True):
-            continue
-        alt_reading = reading['alt'] and reading['type'] in shown_types
-
-        safe_normalize_page(reading['left'], reading_page_normalized, reading_table)
-
-        reading_page = reading_table.cell(0, 0 if reading['left'] else 2)
-        parseText(reading_page, '<b>'
-            + ('OR' if alt_reading else reading_types[reading['type']])
-            + ('</b>  <i>wording may differ if sung</i>' if reading['type'] in ['psalm', 'acclamation'] and not alt_reading and reading['sameline'] else '</b>')
-            + '<_tab>'
-            + reading['ref'],
-        reading_heading_size, 1, pbottom=reading_heading_spacing, left_right=(left_half_width if reading['left'] else right_half_width))
-        shown_types.append(reading['type'])
-
-        if reading['title']:
-            parseText(reading_page, '<b><i>' + reading['title'] + '</i></b>', reading_heading_size, 1, pbottom=reading_heading_spacing)
-        if reading['type'] in ['reading1', 'reading2', 'gospel']:
-            parseText(reading_page, reading['text'], reading['size'], 1, pbottom=reading['margin'])
-        if reading['type'] in ['psalm', 'acclamation']:
-            if not reading['sameline'] and not alt_reading:
-                parseText(reading_page, '<i>wording may differ if sung</i>', reading_heading_size, 1, pbottom=reading_heading_spacing)
-
-            if reading['type'] == 'psalm':
-                parseText(reading_page, '<b>' + reading['text'][0] + '</b>', reading['size'], 1, pbottom=reading_heading_spacing)
-                parseText(reading_page, reading['text'][1], reading['size'], 1, pbottom=reading['margin'])
-            else:
-                parseText(reading_page, '<b>Alleluia, alleluia.</b><br>' + reading['text'] + '<br><b>Alleluia.</b>', reading['size'], 1, pbottom=reading['margin'])
-
-    safe_normalize_page(copyright_page == 0, reading_page_normalized, reading_table)
-    safe_normalize_page(dpa_page == 0, reading_page_normalized, reading_table)
-
-    parseText(reading_table.cell(0, 0 if copyright_page == 0 else 2),
-        '''<i>The text of Sacred Scripture in the Lectionary is from the English Standard Version of the Bible, Catholic Edition (ESV-CE), published by Asian Trading Corporation, \u00a9 2017 Crossway. All rights are reserved. The English Standard Version of the Bible, Catholic Edition is published in the United Kingdom by SPCK Publishing. The Psalms and Canticles are from Abbey Psalms and Canticles \u00a9 2018 United States Conference of Catholic Bishops. Reprinted with permission.</i>''',
-        copyright_size, 1, pbottom=copyright_spacing)
-    parseText(reading_table.cell(0, 0 if dpa_page == 0 else 2),
-        '''<i>Please note the Data Protection Act 2018 restricts the inclusion of the names of our sick unless their consent is given. If you wish to include someone\u2019s name here please speak to Fr John on completing a Consent Form from the sacristy.</i>''',
-        copyright_size, 1)
-
-    doc.save(GLOBAL_PATH+OUTPUT_PATH)
-
-import json
-with open('test.json', encoding='utf-8') as f:
-    data = json.load(f)
-
-build(
-    OUTPUT_PATH='output.docx',
-    front_page_margins=(data['front']['top-margin'], data['front']['left-margin']),
-    info_data=data['front']['latest-info'],
-    info_size=data['front']['latest-info-size'],
-    info_side_width=data['front']['latest-info-side-width'],
-    title=data['front']['title'],
-    title_size=data['front']['title-size'],
-    church_title=data['front']['church-title'],
-    church_title_size=data['front']['church-title-size'],
-    church_info=data['front']['church-info'],
-    church_info_size=data['front']['church-info-size'],
-    mass_info=data['front']['mass-info'],
-    mass_info_size=data['front']['mass-info-size'],
-    data=data['back'],
-    readings=data['readings']['readings'],
-    reading_margins=(data['readings']['options']['top-margin'], data['readings']['options']['left-margin']),
-    reading_heading_spacing=data['readings']['options']['heading-spacing'],
-    reading_heading_size=data['readings']['options']['heading-size'],
-    copyright_size=data['readings']['options']['copyright-size'],
-    copyright_spacing=data['readings']['options']['copyright-spacing'],
-    copyright_page=data['readings']['options']['copyright-page'],
-    dpa_page=data['readings']['options']['dpa-page'],
-)
\ No newline at end of file
+if __name__ == '__main__':
+    main()
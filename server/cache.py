@@ -0,0 +1,144 @@
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+import hashlib
+import json
+import os
+import threading
+import time
+
+# logos stay in it; the build artifacts hashed for their PDFs come and go
+_file_hashes: OrderedDict[Path, tuple[tuple[int, int], str]] = OrderedDict()
+_file_hashes_lock = threading.Lock()
+FILE_HASHES = 256
+
+def file_hash(path: Path) -> str:
+    '''sha256 of a file, cached until its size or mtime changes.'''
+    path = Path(path)
+    st = path.stat()
+    stamp = (st.st_size, st.st_mtime_ns)
+    with _file_hashes_lock:
+        cached = _file_hashes.get(path)
+        if cached is not None and cached[0] == stamp:
+            _file_hashes.move_to_end(path)
+            return cached[1]
+
+    with open(path, 'rb') as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    with _file_hashes_lock:
+        _file_hashes[path] = (stamp, digest)
+        _file_hashes.move_to_end(path)
+        while len(_file_hashes) > FILE_HASHES:
+            _file_hashes.popitem(last=False)
+    return digest
+
+def canonical_json(data) -> bytes:
+    return json.dumps(data, sort_keys=True, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+def payload_hash(data, *assets: Path) -> str:
+    '''Content address of a build: the canonical request JSON (or bytes) plus every asset it embeds.'''
+    h = hashlib.sha256(data if isinstance(data, bytes) else canonical_json(data))
+    for asset in assets:
+        h.update(file_hash(asset).encode())
+    return h.hexdigest()
+
+@contextmanager
+def atomic_path(path: Path):
+    '''Yields a temp path beside `path` and renames it into place only if the block succeeds.'''
+    path = Path(path)
+    tmp = path.with_name(f'.{path.stem}.{os.getpid()}.{threading.get_ident()}.tmp{path.suffix}')
+    try:
+        yield tmp
+        os.replace(tmp, path)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+def write_atomic(path: Path, data: str | bytes) -> None:
+    with atomic_path(path) as tmp:
+        if isinstance(data, str):
+            tmp.write_text(data, encoding='utf-8')
+        else:
+            tmp.write_bytes(data)
+
+class BuildCache:
+    '''
+    Content-addressed build artifacts on disk: `<key>.docx` plus any derived files (`<key>.pdf`).
+    Entries are evicted least recently used first once they exceed the size or count limit, or once
+    they are older than `max_age` seconds. Recency is the file mtime (touched on every hit), so
+    several workers can share one directory.
+    '''
+
+    def __init__(self, root: Path, max_bytes: int = 64 * 2**20, max_count: int = 200, max_age: float = 7 * 86400):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_count = max_count
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def path(self, key: str, ext: str = 'docx') -> Path:
+        return self.root/f'{key}.{ext}'
+
+    def get(self, key: str, ext: str = 'docx') -> Path | None:
+        path = self.path(key, ext)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def lookup(self, key: str) -> Path | None:
+        '''`get` for the build path, counted towards the hit rate.'''
+        path = self.get(key)
+        with self._lock:
+            if path is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return path
+
+    def _entries(self) -> dict[str, list[tuple[Path, os.stat_result]]]:
+        entries = {}
+        for f in self.root.iterdir():
+            try:
+                st = f.stat()
+            except FileNotFoundError:
+                continue
+            if f.name.startswith('.'):
+                # temp file of a crashed writer
+                if time.time() - st.st_mtime > 3600:
+                    f.unlink(missing_ok=True)
+                continue
+            entries.setdefault(f.name.split('.')[0], []).append((f, st))
+        return entries
+
+    def evict(self) -> None:
+        now = time.time()
+        entries = sorted((
+            (max(st.st_mtime for _, st in files), sum(st.st_size for _, st in files), files)
+            for files in self._entries().values()
+        ), key=lambda e: e[0])
+
+        total = sum(size for _, size, _ in entries)
+        count = len(entries)
+        for mtime, size, files in entries:
+            if total <= self.max_bytes and count <= self.max_count and now - mtime <= self.max_age:
+                break
+            for f, _ in files:
+                f.unlink(missing_ok=True)
+            total -= size
+            count -= 1
+
+    def stats(self) -> dict:
+        entries = self._entries()
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': len(entries),
+            'bytes': sum(st.st_size for files in entries.values() for _, st in files),
+            'max_bytes': self.max_bytes,
+            'max_count': self.max_count,
+            'max_age': self.max_age,
+        }
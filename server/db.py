@@ -0,0 +1,172 @@
+from cache import canonical_json
+
+from pathlib import Path
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS templates (
+    name TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    etag TEXT NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS payloads (
+    hash TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS builds (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    build_id TEXT NOT NULL,
+    payload TEXT NOT NULL REFERENCES payloads(hash),
+    docx TEXT NOT NULL,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS builds_build_id ON builds(build_id);
+'''
+
+class Database:
+    '''
+    SQLite storage for templates, the latest payload and the build history. Each worker process
+    keeps one connection (reopened after a fork) shared by its threads. WAL mode lets the workers
+    read while one of them writes.
+    '''
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._conn = None
+        self._pid = None
+        self._lock = threading.Lock()
+        # parsed JSON by content hash, so a read only parses what changed
+        self._parsed: dict[str, dict] = {}
+        with self._lock:
+            self._connection().executescript(SCHEMA)
+        self.templates = SqliteTemplateStore(self)
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.execute('PRAGMA foreign_keys=ON')
+            self._pid = os.getpid()
+        return self._conn
+
+    def query(self, sql: str, args=()) -> list[tuple]:
+        with self._lock:
+            return self._connection().execute(sql, args).fetchall()
+
+    def transaction(self, *statements: tuple[str, tuple]) -> sqlite3.Cursor:
+        '''Runs every (sql, args) in one transaction and returns the last cursor.'''
+        with self._lock:
+            conn = self._connection()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                for sql, args in statements:
+                    cur = conn.execute(sql, args)
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            return cur
+
+    def cached(self, etag: str) -> dict | None:
+        return self._parsed.get(etag)
+
+    def parse(self, etag: str, text: str) -> dict:
+        data = self._parsed.get(etag)
+        if data is None:
+            if len(self._parsed) >= 256:
+                self._parsed.clear()
+            data = self._parsed[etag] = json.loads(text)
+        return data
+
+    def record_build(self, data: dict, build_id: str, docx: Path) -> int:
+        '''Adds a build to the history; its payload becomes the latest one. Returns the history id.'''
+        raw = canonical_json(data)
+        digest = hashlib.sha256(raw).hexdigest()
+        cur = self.transaction(
+            ('INSERT OR IGNORE INTO payloads (hash, data) VALUES (?, ?)', (digest, raw.decode('utf-8'))),
+            ('INSERT INTO builds (build_id, payload, docx, created) VALUES (?, ?, ?, ?)',
+                (build_id, digest, str(docx), time.time())),
+        )
+        return cur.lastrowid
+
+    def latest(self) -> tuple[dict, str]:
+        '''(payload, etag) of the most recent build. Raises FileNotFoundError before the first one.'''
+        rows = self.query(
+            'SELECT p.hash, p.data FROM builds b JOIN payloads p ON p.hash = b.payload ORDER BY b.id DESC LIMIT 1'
+        )
+        if not rows:
+            raise FileNotFoundError('no builds yet')
+        etag, text = rows[0]
+        return self.parse(etag, text), etag
+
+    def history(self, limit: int = 50, before: int | None = None) -> list[dict]:
+        rows = self.query(
+            'SELECT id, build_id, docx, created FROM builds WHERE id < ? ORDER BY id DESC LIMIT ?',
+            (before if before is not None else 2**63 - 1, limit)
+        )
+        return [{'id': id, 'build': build_id, 'docx': docx, 'created': created} for id, build_id, docx, created in rows]
+
+    def build(self, id: int) -> dict | None:
+        rows = self.query(
+            'SELECT b.id, b.build_id, b.docx, b.created, p.hash, p.data '
+            'FROM builds b JOIN payloads p ON p.hash = b.payload WHERE b.id = ?', (id,)
+        )
+        if not rows:
+            return None
+        id, build_id, docx, created, etag, text = rows[0]
+        return {'id': id, 'build': build_id, 'docx': docx, 'created': created, 'payload': self.parse(etag, text)}
+
+    def import_templates(self, json_dir: Path) -> None:
+        '''Seeds an empty template table from the file backend's json/*.json.'''
+        if self.query('SELECT 1 FROM templates LIMIT 1'):
+            return
+        for f in sorted(Path(json_dir).glob('*.json')):
+            if not f.name.startswith('.'):
+                self.templates.save(f.stem, json.loads(f.read_bytes()))
+
+class SqliteTemplateStore:
+    '''`templates.TemplateStore` on top of a `Database`.'''
+
+    def __init__(self, db: Database):
+        self.db = db
+
+    def names(self) -> list[str]:
+        return [name for name, in self.db.query('SELECT name FROM templates ORDER BY name')]
+
+    def etag(self) -> str:
+        return hashlib.sha256(canonical_json(self.names())).hexdigest()
+
+    def get(self, name: str) -> tuple[dict, str]:
+        rows = self.db.query('SELECT etag FROM templates WHERE name = ?', (name,))
+        if not rows:
+            raise FileNotFoundError(name)
+        etag, = rows[0]
+        data = self.db.cached(etag)
+        if data is None:
+            rows = self.db.query('SELECT etag, data FROM templates WHERE name = ?', (name,))
+            if not rows:
+                raise FileNotFoundError(name)
+            etag, text = rows[0]
+            data = self.db.parse(etag, text)
+        return data, etag
+
+    def save(self, name: str, data: dict) -> str:
+        text = json.dumps(data, separators=(',', ':'), ensure_ascii=False)
+        etag = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        self.db.transaction((
+            'INSERT INTO templates (name, data, etag, updated) VALUES (?, ?, ?, ?) '
+            'ON CONFLICT(name) DO UPDATE SET data = excluded.data, etag = excluded.etag, updated = excluded.updated',
+            (name, text, etag, time.time())
+        ))
+        return etag
+
+    def delete(self, name: str) -> None:
+        if not self.db.transaction(('DELETE FROM templates WHERE name = ?', (name,))).rowcount:
+            raise FileNotFoundError(name)
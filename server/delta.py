@@ -0,0 +1,157 @@
+'''
+JSON Patch (RFC 6902) deltas between editor payloads, so a preview only uploads the fields that
+changed since the last one.
+'''
+import copy
+
+def _pointer(path) -> list[str]:
+    if not isinstance(path, str) or (path and not path.startswith('/')):
+        raise ValueError(f'{path!r} is not a JSON pointer')
+    return [token.replace('~1', '/').replace('~0', '~') for token in path.split('/')[1:]]
+
+def _escape(token) -> str:
+    return str(token).replace('~', '~0').replace('/', '~1')
+
+def _index(container: list, token: str, path: str, end: bool = False) -> int:
+    '''The list index `token` names; with `end` it may also be one past the last item (or `-`).'''
+    if end and token == '-':
+        return len(container)
+    if not token.isdigit() or (len(token) > 1 and token[0] == '0'):
+        raise ValueError(f'{path}: {token!r} is not a list index')
+    i = int(token)
+    if i >= len(container) + end:
+        raise ValueError(f'{path}: index {i} is out of range')
+    return i
+
+class _Patcher:
+    '''
+    Applies operations to a copy of `doc` that shares everything the operations do not touch:
+    each container on an operation's path is copied (once) before it is changed.
+    '''
+
+    def __init__(self, doc):
+        self.root = [doc]
+        self._owned = {id(self.root)}
+
+    def _child(self, container, key, path: str):
+        if isinstance(container, list) and container is not self.root:
+            key = _index(container, key, path)
+        try:
+            child = container[key]
+        except (KeyError, IndexError, TypeError):
+            raise ValueError(f'{path} does not exist') from None
+        if isinstance(child, (dict, list)) and id(child) not in self._owned:
+            child = container[key] = copy.copy(child)
+            self._owned.add(id(child))
+        return child
+
+    def _parent(self, path: str) -> tuple[list | dict, str | int]:
+        '''(container, key) for the last token of `path`, with every container above it copied.'''
+        tokens = _pointer(path)
+        container, key = self.root, 0
+        for token in tokens:
+            container = self._child(container, key, path)
+            if not isinstance(container, (dict, list)):
+                raise ValueError(f'{path} does not exist')
+            key = token
+        return container, key
+
+    def get(self, path: str):
+        value = self.root[0]
+        for token in _pointer(path):
+            if isinstance(value, list):
+                value = value[_index(value, token, path)]
+            elif isinstance(value, dict) and token in value:
+                value = value[token]
+            else:
+                raise ValueError(f'{path} does not exist')
+        return value
+
+    def add(self, path: str, value) -> None:
+        container, key = self._parent(path)
+        if container is self.root:
+            container[0] = value
+        elif isinstance(container, list):
+            container.insert(_index(container, key, path, end=True), value)
+        else:
+            container[key] = value
+
+    def remove(self, path: str):
+        container, key = self._parent(path)
+        if container is self.root:
+            raise ValueError('cannot remove the whole document')
+        if isinstance(container, list):
+            return container.pop(_index(container, key, path))
+        if key not in container:
+            raise ValueError(f'{path} does not exist')
+        return container.pop(key)
+
+    def replace(self, path: str, value) -> None:
+        container, key = self._parent(path)
+        if isinstance(container, list) and container is not self.root:
+            key = _index(container, key, path)
+        elif isinstance(container, dict) and key not in container:
+            raise ValueError(f'{path} does not exist')
+        container[key] = value
+
+    def apply(self, op) -> None:
+        if not isinstance(op, dict) or 'op' not in op or 'path' not in op:
+            raise ValueError(f'{op!r} is not a patch operation')
+        kind, path = op['op'], op['path']
+        if kind in ('add', 'replace', 'test') and 'value' not in op:
+            raise ValueError(f'{kind} {path} has no value')
+        if kind in ('move', 'copy') and 'from' not in op:
+            raise ValueError(f'{kind} {path} has no from')
+
+        if kind == 'add':
+            self.add(path, op['value'])
+        elif kind == 'remove':
+            self.remove(path)
+        elif kind == 'replace':
+            self.replace(path, op['value'])
+        elif kind == 'move':
+            if path.startswith(op['from'] + '/'):
+                raise ValueError(f'cannot move {op["from"]} into itself')
+            self.add(path, self.remove(op['from']))
+        elif kind == 'copy':
+            # a deep copy, so later operations on either path do not change both
+            self.add(path, copy.deepcopy(self.get(op['from'])))
+        elif kind == 'test':
+            value = self.get(path)
+            if value != op['value'] or isinstance(value, bool) != isinstance(op['value'], bool):
+                raise ValueError(f'test {path} failed')
+        else:
+            raise ValueError(f'unknown patch operation {kind!r}')
+
+def apply_patch(doc, ops: list):
+    '''
+    `doc` with the RFC 6902 `ops` applied, in order. `doc` itself is not modified and shares what
+    the patch did not touch with the result. Raises ValueError for bad or failing operations.
+    '''
+    if not isinstance(ops, list):
+        raise ValueError('a patch must be a list of operations')
+    patcher = _Patcher(doc)
+    for op in ops:
+        patcher.apply(op)
+    return patcher.root[0]
+
+def diff(old, new, path: str = '') -> list[dict]:
+    '''A patch that turns `old` into `new`: changed values are replaced, lists grow and shrink at the end.'''
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops = [{'op': 'remove', 'path': f'{path}/{_escape(key)}'} for key in old if key not in new]
+        for key, value in new.items():
+            if key in old:
+                ops += diff(old[key], value, f'{path}/{_escape(key)}')
+            else:
+                ops.append({'op': 'add', 'path': f'{path}/{_escape(key)}', 'value': value})
+        return ops
+    if isinstance(old, list) and isinstance(new, list):
+        ops = []
+        for i, (a, b) in enumerate(zip(old, new)):
+            ops += diff(a, b, f'{path}/{i}')
+        ops += [{'op': 'add', 'path': f'{path}/-', 'value': value} for value in new[len(old):]]
+        ops += [{'op': 'remove', 'path': f'{path}/{i}'} for i in reversed(range(len(new), len(old)))]
+        return ops
+    if old == new and type(old) is type(new):
+        return []
+    return [{'op': 'replace', 'path': path, 'value': new}]
@@ -0,0 +1,175 @@
+from cache import write_atomic
+from timing import profiling
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import json
+import threading
+import time
+import uuid
+
+class QueueFull(Exception):
+    pass
+
+class Job:
+    def __init__(self, id: str, client: str | None, payload: dict | None, status: str = 'queued', created: float | None = None):
+        self.id = id
+        self.client = client
+        self.payload = payload
+        self.status = status
+        self.created = created or time.time()
+        self.result = None
+        self.error = None
+        self.superseded_by = None
+        # spans and counts of the run, in memory only
+        self.profile = None
+        self.finished = threading.Event()
+
+    def record(self) -> dict:
+        out = {'id': self.id, 'client': self.client, 'status': self.status, 'created': self.created}
+        if self.status in ('queued', 'running'):
+            out['payload'] = self.payload
+        for name in ('result', 'error', 'superseded_by'):
+            if getattr(self, name) is not None:
+                out[name] = getattr(self, name)
+        return out
+
+    def status_report(self) -> dict:
+        out = self.record()
+        out.pop('payload', None)
+        out.pop('client')
+        return out
+
+class JobQueue:
+    '''
+    Runs `run(payload)` on a few worker threads, at most `max_pending` jobs queued or running at
+    once. A job that is still queued when the same client submits another one is superseded and
+    never runs, so a burst of preview edits renders only the newest. Jobs without a client id never
+    supersede anything. Every job is recorded in
+    `root` as it changes state, and jobs that were queued or running when the process stopped are
+    queued again on start.
+    '''
+
+    def __init__(self, root: Path, run, workers: int = 2, max_pending: int = 16, max_age: float = 86400):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.run = run
+        self.max_pending = max_pending
+        self.max_age = max_age
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix='build')
+        self._jobs: dict[str, Job] = {}
+        self._queued_by_client: dict[str, Job] = {}
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def _save(self, job: Job) -> None:
+        write_atomic(self.root/f'{job.id}.json', json.dumps(job.record(), separators=(',', ':'), ensure_ascii=False))
+
+    def recover(self) -> int:
+        '''Queues again every job left unfinished by the last process and drops old records.'''
+        recovered = 0
+        for f in self.root.glob('*.json'):
+            if f.name.startswith('.'):
+                continue
+            try:
+                record = json.loads(f.read_bytes())
+            except (OSError, ValueError):
+                continue
+            if record['status'] in ('queued', 'running') and 'payload' in record:
+                job = Job(record['id'], record['client'], record['payload'], created=record['created'])
+                with self._lock:
+                    self._jobs[job.id] = job
+                    self._pending += 1
+                self._save(job)
+                self._executor.submit(self._work, job)
+                recovered += 1
+            elif time.time() - record['created'] > self.max_age:
+                f.unlink(missing_ok=True)
+        return recovered
+
+    def submit(self, payload: dict, client: str | None = None) -> Job:
+        job = Job(uuid.uuid4().hex, client, payload)
+        with self._lock:
+            previous = self._queued_by_client.get(client) if client else None
+            if previous is not None and previous.status == 'queued':
+                previous.status = 'superseded'
+                previous.superseded_by = job.id
+                previous.payload = None
+                self._pending -= 1
+            else:
+                previous = None
+            if self._pending >= self.max_pending:
+                raise QueueFull
+            self._pending += 1
+            self._jobs[job.id] = job
+            if client:
+                self._queued_by_client[client] = job
+            self._prune()
+
+        if previous is not None:
+            self._save(previous)
+            previous.finished.set()
+        self._save(job)
+        self._executor.submit(self._work, job)
+        return job
+
+    def _prune(self) -> None:
+        cutoff = time.time() - self.max_age
+        if len(self._jobs) > 1024:
+            for id in [id for id, job in self._jobs.items() if job.finished.is_set() and job.created < cutoff]:
+                del self._jobs[id]
+                (self.root/f'{id}.json').unlink(missing_ok=True)
+
+    def _work(self, job: Job) -> None:
+        with self._lock:
+            if job.status != 'queued':
+                return
+            job.status = 'running'
+            if self._queued_by_client.get(job.client) is job:
+                del self._queued_by_client[job.client]
+        self._save(job)
+
+        try:
+            with profiling() as job.profile:
+                job.result = self.run(job.payload)
+            job.status = 'done'
+        except Exception as e:
+            job.error = f'{type(e).__name__}: {e}'
+            job.status = 'failed'
+        job.payload = None
+        with self._lock:
+            self._pending -= 1
+        self._save(job)
+        job.finished.set()
+
+    def get(self, id: str) -> Job | None:
+        with self._lock:
+            job = self._jobs.get(id)
+        if job is not None:
+            return job
+
+        # finished before a restart
+        try:
+            record = json.loads((self.root/f'{id}.json').read_bytes())
+        except (OSError, ValueError):
+            return None
+        job = Job(record['id'], record['client'], None, record['status'], record['created'])
+        job.result, job.error, job.superseded_by = record.get('result'), record.get('error'), record.get('superseded_by')
+        job.finished.set()
+        return job
+
+    def wait(self, job: Job, timeout: float) -> Job:
+        '''Waits up to `timeout` seconds for `job`, or for whichever job superseded it.'''
+        deadline = time.monotonic() + timeout
+        while True:
+            job.finished.wait(max(0, deadline - time.monotonic()))
+            if job.status == 'superseded' and job.superseded_by:
+                newer = self.get(job.superseded_by)
+                if newer is not None:
+                    job = newer
+                    continue
+            return job
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'pending': self._pending, 'max_pending': self.max_pending}
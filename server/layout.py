@@ -0,0 +1,417 @@
+'''
+Estimates how full each cell of a bulletin will be, straight from the payload, without
+python-docx. Text is measured with Calibri advance widths and wrapped the way Word does it:
+greedily at spaces, overlong words broken anywhere. It is an estimate (no kerning, bold
+approximated), meant to catch overflow before a build rather than to reproduce Word exactly.
+'''
+from markup import compile_markup
+from payload import Front, Notice, Payload, Reading, ReadingOptions, parse, parse_options, parse_readings
+from readings import COPYRIGHT, DPA_NOTICE, reading_texts
+
+from dataclasses import replace
+from functools import lru_cache
+from pathlib import Path
+import math
+import re
+import struct
+
+# Calibri advance widths in font units (2048 per em)
+UNITS_PER_EM = 2048
+WIDTHS = {
+    ' ': 463, '!': 544, '"': 821, '#': 1019, '$': 1038, '%': 1464, '&': 1397, "'": 452, '(': 621, ')': 621,
+    '*': 1019, '+': 1038, ',': 511, '-': 627, '.': 517, '/': 791, ':': 548, ';': 548, '<': 1038, '=': 1038,
+    '>': 1038, '?': 944, '@': 1823, '[': 627, '\\': 791, ']': 627, '^': 1038, '_': 1020, '`': 589, '{': 682,
+    '|': 941, '}': 682, '~': 1038,
+    **dict.fromkeys('0123456789', 1038),
+    'A': 1185, 'B': 1114, 'C': 1092, 'D': 1260, 'E': 1000, 'F': 941, 'G': 1292, 'H': 1276, 'I': 516,
+    'J': 653, 'K': 1064, 'L': 861, 'M': 1751, 'N': 1322, 'O': 1356, 'P': 1058, 'Q': 1378, 'R': 1112,
+    'S': 941, 'T': 998, 'U': 1314, 'V': 1162, 'W': 1822, 'X': 1063, 'Y': 998, 'Z': 959,
+    'a': 981, 'b': 1076, 'c': 866, 'd': 1076, 'e': 1019, 'f': 625, 'g': 964, 'h': 1076, 'i': 470,
+    'j': 490, 'k': 931, 'l': 470, 'm': 1636, 'n': 1076, 'o': 1080, 'p': 1076, 'q': 1076, 'r': 714,
+    's': 801, 't': 686, 'u': 1076, 'v': 925, 'w': 1464, 'x': 887, 'y': 927, 'z': 809,
+    '‘': 515, '’': 515, '“': 817, '”': 817, '–': 1024, '—': 1833,
+    '…': 1413, '©': 1636, '\u00a0': 463,
+}
+DEFAULT_WIDTH = 1000
+# Calibri Bold runs a few percent wider than the regular face
+BOLD = 1.035
+SUPERSCRIPT = 0.65
+# the least a tab can take up before the reference wraps onto its own line
+TAB = 1.0
+
+# ascent + descent + line gap of Calibri: the height of a single-spaced line, per point of size
+LINE_HEIGHT = 2500 / UNITS_PER_EM
+# an empty paragraph is as tall as its mark, which keeps the template's 11pt
+MARK_SIZE = 11
+BULLET_INDENT = 24
+
+def emu_to_pt(val: float) -> float:
+    return val / 12700
+
+def mm(val: float) -> int:
+    return int(val * 36000)
+
+def pt(val: float) -> int:
+    return int(val * 12700)
+
+@lru_cache(maxsize=65536)
+def text_width(text: str, flags: str) -> float:
+    '''Advance width of `text` in ems.'''
+    width = sum(WIDTHS.get(c, DEFAULT_WIDTH) for c in text) / UNITS_PER_EM
+    if 'b' in flags:
+        width *= BOLD
+    if 's' in flags:
+        width *= SUPERSCRIPT
+    return width
+
+# where Word may break a line (not at no-break spaces)
+SPACES = re.compile(r'([ \t\n]+)')
+
+def pieces(runs) -> list[tuple[float, float]]:
+    '''(width, width of the spaces after it) of every unbreakable piece of a paragraph, in ems.'''
+    out = []
+    word = space = 0.0
+    for text, flags in runs:
+        if flags is None:
+            segments, flags = [' '], ''
+            tab = True
+        else:
+            segments = SPACES.split(text)
+            tab = False
+        for segment in segments:
+            if not segment:
+                continue
+            if SPACES.fullmatch(segment):
+                space += TAB if tab else text_width(segment, flags)
+                continue
+            if space:
+                out.append((word, space))
+                word = space = 0.0
+            word += text_width(segment, flags)
+    out.append((word, space))
+    return out
+
+@lru_cache(maxsize=16384)
+def line_count(runs: tuple, width: float) -> int:
+    '''Lines a paragraph wraps to in a column `width` ems wide.'''
+    lines, x = 1, 0.0
+    for word, space in pieces(runs):
+        if x and x + word > width:
+            lines += 1
+            x = 0.0
+        if word > width:
+            lines += math.ceil(word / width) - 1
+            word %= width
+        x += word + space
+    return lines
+
+class Cell:
+    '''
+    Height of the paragraphs added to a table cell, following `parseText` call by call,
+    including how it drops blank paragraphs.
+    '''
+
+    def __init__(self, width: float, available: float | None = None):
+        self.width = width
+        self.available = available
+        self.heights: list[float] = []
+        self.first_blank = False
+        self.extra = 0.0
+        self.lines = 0
+
+    def add(self, raw_text, size, spacing, ptop=0, pbottom=0, tabs=False):
+        paragraphs = compile_markup(raw_text, tabs)
+        keep = [p for p in paragraphs if not p.blank]
+        if self.first_blank:
+            self.heights.pop(0)
+            self.first_blank = False
+        if not keep and not self.heights:
+            keep = paragraphs[-1:]
+            self.first_blank = True
+
+        if keep and keep[-1] is not paragraphs[-1]:
+            pbottom = 0
+        for n, (kind, runs, _) in enumerate(keep):
+            top = ptop if kind == 'first' else 0
+            bottom = pbottom if n == len(keep) - 1 else 0
+            width = self.width - (BULLET_INDENT if kind == 'bullet' else 0)
+            # text at size 0 (which the payload allows) takes no room
+            lines = line_count(runs, round(width / size, 3)) if size > 0 else 0
+            self.lines += lines
+            line = (size if any(text for text, _ in runs) else MARK_SIZE) * LINE_HEIGHT * spacing
+            self.heights.append(top + bottom + lines * line)
+
+    @property
+    def height(self) -> float:
+        return sum(self.heights) + self.extra
+
+    def report(self) -> dict:
+        out = {'height': round(self.height, 1)}
+        if self.available is not None:
+            out['available'] = round(self.available, 1)
+            out['fill'] = round(self.height / self.available, 3) if self.available > 0 else None
+        return out
+
+@lru_cache(maxsize=8)
+def image_size(path: Path) -> tuple[int, int] | None:
+    '''(width, height) in pixels of a PNG, read from its header.'''
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(24)
+    except FileNotFoundError:
+        return None
+    if head[:8] != b'\x89PNG\r\n\x1a\n':
+        return None
+    return struct.unpack('>II', head[16:24])
+
+class Geometry:
+    '''Page and column sizes in points, rounded exactly as `Skeleton.new_document` rounds them.'''
+
+    def __init__(self, front_page_margins, reading_margins):
+        page_width, page_height = mm(297), mm(210)
+
+        top, side = mm(front_page_margins[0]), mm(front_page_margins[1])
+        top_margin, left_margin, right_margin = round(top * 0.8), round(side * 0.8), round(side * 1.3)
+        self.front_height = emu_to_pt(page_height - 2 * top_margin)
+        self.front_widths = (
+            emu_to_pt(round(page_width / 2 - left_margin - side * .9 / 2)),
+            emu_to_pt(round(page_width / 2 - right_margin - side * .4 / 2)),
+        )
+
+        reading_top, reading_side = mm(reading_margins[0]), mm(reading_margins[1])
+        left_margin, right_margin = round(reading_side * 0.8), round(reading_side * 1.3)
+        self.reading_height = emu_to_pt(page_height - reading_top - mm(8))
+        self.reading_widths = (
+            emu_to_pt(round(page_width / 2 - left_margin - reading_side * .9 / 2)),
+            emu_to_pt(round(page_width / 2 - right_margin - reading_side * .4 / 2)),
+        )
+
+def twips(val: float) -> float:
+    return val / 20
+
+def cell_margin(val: float) -> float:
+    '''`bulletin.cellMargin` in points.'''
+    return emu_to_pt(350 * val)
+
+def to_cell_margin(val_mm: float) -> float:
+    '''`bulletin.toCellMargin(Mm(val_mm))` in points (the value is written as twips).'''
+    return twips(mm(val_mm) / 350)
+
+def reading_cells(readings: tuple[Reading, ...], options: ReadingOptions, geometry: Geometry, sizes: dict[int, float] | None = None,
+        copyright: str = COPYRIGHT, dpa_notice: str = DPA_NOTICE) -> tuple[Cell, Cell]:
+    '''
+    The left and right reading columns. `sizes` overrides the text size of readings by index,
+    which is how the suggestions (and the auto-fit solver) try sizes out.
+    '''
+    if sizes:
+        readings = [replace(r, size=sizes[n]) if n in sizes else r for n, r in enumerate(readings)]
+    left, right = (Cell(width, geometry.reading_height) for width in geometry.reading_widths)
+    for is_left, text, size, pbottom, heading in reading_texts(readings, options.heading_size, options.heading_spacing):
+        (left if is_left else right).add(text, size, 1, pbottom=pbottom, tabs=heading)
+
+    (left if options.copyright_page == 0 else right).add(copyright, options.copyright_size, 1, pbottom=options.copyright_spacing)
+    (left if options.dpa_page == 0 else right).add(dpa_notice, options.copyright_size, 1)
+    return left, right
+
+def front_cells(front: Front, geometry: Geometry, logo: Path) -> tuple[Cell, list[dict]]:
+    '''The front page (title, logo, church details, mass times) and every latest-info row.'''
+    width = geometry.front_widths[1]
+    side_width = front.latest_info_side_width / 100
+    size = front.latest_info_size
+
+    info_rows = sum(len(group.lines) + 1 for group in front.latest_info)
+    rows, total, n = [], 0.0, 0
+    for m, group in enumerate(front.latest_info):
+        side_size, side = group.side_size, group.side
+        group_height = 0.0
+        for tm, line in enumerate(group.lines):
+            lines, txt = line.lines, line.text
+            height = emu_to_pt(pt(size * 1.22 * lines)) + cell_margin(2 * 70)
+            # the last row has no fixed height and grows with its text
+            if n != info_rows - 1:
+                cell = Cell((width * (1 - side_width) if side else width) - 2 * twips(80))
+                cell.add(txt, size, 1)
+                rows.append({'group': m, 'row': tm, 'lines': lines, 'needed': cell.lines})
+            group_height += height
+            total += height + cell_margin(2 * 70)
+            n += 1
+
+        if side:
+            cell = Cell(width * side_width - 2 * twips(80))
+            cell.add(side, side_size, 1)
+            needed = cell.lines * side_size * LINE_HEIGHT
+            rows.append({'group': m, 'side': True, 'height': round(needed, 1), 'available': round(group_height, 1)})
+
+    page = Cell(width, geometry.front_height - total)
+    page.add(front.title, front.title_size, 1.3, 20)
+    pixels = image_size(logo)
+    logo_width = emu_to_pt(mm(54))
+    page.extra += 5 + (logo_width * pixels[1] / pixels[0] if pixels else logo_width)
+    page.add(front.church_title, front.church_title_size, 1.2, 13)
+    page.add(front.church_info, front.church_info_size, 1.2, 2)
+    page.extra += mass_table_height(front.mass_info, front.mass_info_size, width)
+    return page, rows
+
+def mass_table_height(mass_info: tuple[str, ...], size: float, width: float) -> float:
+    '''The mass times table, laid out like `build()` lays it out for each number of cells.'''
+    if not mass_info:
+        return 0.0
+    cols = {1: 1, 2: 2, 3: 2, 4: 2}.get(len(mass_info), math.ceil(len(mass_info) / 2))
+
+    def height(txt):
+        cell = Cell(width / cols)
+        cell.add(txt, size, 1)
+        return cell.height + twips(150) + twips(50)
+
+    heights = [height(txt) for txt in mass_info]
+    match len(mass_info):
+        case 1 | 2:
+            return max(heights)
+        case 3:
+            return max(heights[0] + heights[1], heights[2])
+        case _:
+            # filled column by column, two rows
+            return max(heights[0::2], default=0) + max(heights[1::2], default=0)
+
+def back_cell(back: tuple[Notice, ...], geometry: Geometry) -> Cell:
+    width = geometry.front_widths[0]
+    page = Cell(width, geometry.front_height)
+    for notice in back:
+        cell = Cell(width - 2 * twips(80))
+        cell.add(notice.text, notice.size, 1)
+        page.extra += cell.height + 2 * to_cell_margin(notice.margin)
+    return page
+
+def largest_fitting(fits, low: float, high: float, step: float = 0.5) -> float | None:
+    '''Binary search over `step`-sized values for the largest one in [low, high] where `fits`.'''
+    lo, hi = math.ceil(low / step), math.floor(high / step)
+    if lo > hi or not fits(lo * step):
+        return None
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if fits(mid * step):
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo * step
+
+def preflight(data: dict | Payload, logo: Path, copyright: str = COPYRIGHT, dpa_notice: str = DPA_NOTICE) -> dict:
+    '''
+    Estimated fill of every cell of a payload, with warnings and suggested sizes for overflow.
+    `logo`, `copyright` and `dpa_notice` are the parish's, as `build()` gets them.
+    '''
+    payload = parse(data)
+    front, readings, options = payload.front, payload.readings, payload.options
+    geometry = Geometry(
+        (front.top_margin, front.left_margin),
+        (options.top_margin, options.left_margin)
+    )
+
+    page, info = front_cells(front, geometry, logo)
+    back = back_cell(payload.back, geometry)
+    left, right = reading_cells(readings, options, geometry, copyright=copyright, dpa_notice=dpa_notice)
+    cells = {'front': page, 'back': back, 'readings-left': left, 'readings-right': right}
+
+    warnings, suggestions = [], []
+    for name, cell in cells.items():
+        if cell.height > cell.available:
+            warnings.append(f'{name} overflows by {cell.height - cell.available:.1f}pt')
+    for row in info:
+        if row.get('side'):
+            if row['height'] > row['available']:
+                warnings.append(f'latest-info group {row["group"] + 1} side needs {row["height"]:.1f}pt but has {row["available"]:.1f}pt')
+        elif row['needed'] > row['lines']:
+            warnings.append(f'latest-info group {row["group"] + 1} row {row["row"] + 1} wraps to {row["needed"]} lines but has {row["lines"]}')
+            suggestions.append({'latest-info': [row['group'], row['row']], 'lines': row['needed']})
+
+    # one text size for every reading in an overflowing column
+    for column, is_left in (('readings-left', True), ('readings-right', False)):
+        if cells[column].height <= cells[column].available:
+            continue
+        indexes = [n for n, r in enumerate(readings) if r.include and r.left == is_left]
+        if not indexes:
+            continue
+        current = max(readings[n].size for n in indexes)
+
+        def fits(size):
+            cell = reading_cells(readings, options, geometry, dict.fromkeys(indexes, size), copyright, dpa_notice)[0 if is_left else 1]
+            return cell.height <= cell.available
+        size = largest_fitting(fits, 5, current)
+        suggestions.append({'cell': column, 'readings': indexes, 'size': size})
+
+    return {
+        'cells': {name: cell.report() for name, cell in cells.items()},
+        'info': info,
+        'warnings': warnings,
+        'suggestions': suggestions,
+    }
+
+def fitted(data: dict, sizes: dict[int, float], spacing: float, margins: tuple[float, float]) -> dict:
+    '''`data` with reading sizes by index, heading spacing and reading margins scaled by `spacing`, and reading page margins replaced.'''
+    readings, options = data['readings']['readings'], data['readings']['options']
+    return {**data, 'readings': {
+        **data['readings'],
+        'options': {
+            **options,
+            'heading-spacing': round(options['heading-spacing'] * spacing, 1),
+            'top-margin': margins[0],
+            'left-margin': margins[1],
+        },
+        'readings': [
+            {**r, 'size': sizes.get(n, r['size']), 'margin': round(r['margin'] * spacing, 1)}
+            for n, r in enumerate(readings)
+        ],
+    }}
+
+def autofit(data: dict, min_size: float = 7, max_size: float = 12, copyright: str = COPYRIGHT, dpa_notice: str = DPA_NOTICE) -> tuple[dict, dict]:
+    '''
+    Picks the largest text size per reading column, between `min_size` and `max_size`, that fits
+    both columns of the reading page. Only if even `min_size` overflows does it give up heading
+    spacing and the space after each reading, and then some of the page margins. Every trial is
+    an estimate, so line wraps are shared (and cached) across the whole search.
+    Returns the fitted payload and a summary of what was chosen.
+    '''
+    start = line_count.cache_info()
+    payload = parse(data)
+    margins = payload.options.top_margin, payload.options.left_margin
+    columns = {
+        side: [n for n, r in enumerate(payload.readings) if r.include and r.left == (side == 'left')]
+        for side in ('left', 'right')
+    }
+    # (spacing scale, reading page margins), tried in order until both columns fit
+    stages = [(1, margins), (0.5, margins), (0, margins), (0, (min(margins[0], 5), min(margins[1], 5)))]
+
+    evaluations = 0
+    for spacing, page_margins in stages:
+        geometry = Geometry((payload.front.top_margin, payload.front.left_margin), page_margins)
+        sizes = {}
+        for side, indexes in columns.items():
+            def fits(size):
+                nonlocal evaluations
+                evaluations += 1
+                trial = fitted(data, {**sizes, **dict.fromkeys(indexes, size)}, spacing, page_margins)['readings']
+                cell = reading_cells(parse_readings(trial['readings']), parse_options(trial['options']), geometry,
+                    copyright=copyright, dpa_notice=dpa_notice)[side == 'right']
+                return cell.height <= cell.available
+            size = largest_fitting(fits, min_size, max_size) if indexes else max_size
+            if size is None:
+                break
+            sizes.update(dict.fromkeys(indexes, size))
+        else:
+            fits_page = True
+            break
+    else:
+        # nothing fits: smallest everything, and say so
+        fits_page = False
+        sizes = {n: min_size for indexes in columns.values() for n in indexes}
+
+    end = line_count.cache_info()
+    result = fitted(data, sizes, spacing, page_margins)
+    return result, {
+        'fits': fits_page,
+        'sizes': {side: sizes.get(indexes[0]) if indexes else None for side, indexes in columns.items()},
+        'heading-spacing': result['readings']['options']['heading-spacing'],
+        'margins': list(page_margins),
+        'evaluations': evaluations,
+        'line_cache': {'hits': end.hits - start.hits, 'misses': end.misses - start.misses},
+    }
@@ -0,0 +1,200 @@
+'''
+Readings by date (readings.json responses: `date` plus `readings`), kept in one SQLite file so the
+editor does not wait on the scrape API every time it loads readings.
+
+    python lectionary.py import ../readings.json ../readings2.json   # readings.json-style files
+    python lectionary.py prefetch --start 20251130 --days 365         # a liturgical year from upstream
+    python lectionary.py prefetch --sundays                           # the next year of Sundays
+'''
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date as Date, datetime, timedelta
+from pathlib import Path
+from urllib.parse import urlencode
+from urllib.request import urlopen
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+
+DATE = re.compile(r'\d{8}')
+
+class UpstreamError(Exception):
+    pass
+
+def parse_date(value: str) -> str:
+    '''`value` as yyyymmdd. Raises ValueError for anything that is not a real date.'''
+    try:
+        if DATE.fullmatch(value):
+            datetime.strptime(value, '%Y%m%d')
+            return value
+    except ValueError:
+        pass
+    raise ValueError(f'{value!r} is not a yyyymmdd date')
+
+class ReadingsStore:
+    '''
+    Readings in `path`, one zlib-compressed row per date, with the `max_cached` most recently used
+    dates kept parsed in memory. A date that is not stored is fetched from `upstream` once and kept;
+    after an upstream failure the date is not retried for `retry_after` seconds, so a slow or down
+    upstream only ever costs one request its timeout.
+    '''
+
+    def __init__(self, path: Path, upstream: str | None = None, key: str | None = None,
+            timeout: float = 5, max_cached: int = 512, retry_after: float = 60):
+        self.path = Path(path)
+        self.upstream = upstream
+        self.key = key
+        self.timeout = timeout
+        self.max_cached = max_cached
+        self.retry_after = retry_after
+        self.hits = 0
+        self.misses = 0
+        self._conn = None
+        self._pid = None
+        self._lock = threading.Lock()
+        # date -> (response, etag)
+        self._cached: OrderedDict[str, tuple[dict, str]] = OrderedDict()
+        self._failed: dict[str, float] = {}
+        with self._lock:
+            self._connection().execute(
+                'CREATE TABLE IF NOT EXISTS readings (date TEXT PRIMARY KEY, data BLOB NOT NULL, fetched REAL NOT NULL) WITHOUT ROWID'
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._pid = os.getpid()
+        return self._conn
+
+    def _remember(self, date: str, blob: bytes) -> tuple[dict, str]:
+        entry = json.loads(zlib.decompress(blob)), hashlib.sha256(blob).hexdigest()
+        with self._lock:
+            self._cached[date] = entry
+            while len(self._cached) > self.max_cached:
+                self._cached.popitem(last=False)
+        return entry
+
+    def get(self, date: str, fetch: bool = True) -> tuple[dict, str] | None:
+        '''(response, etag) for `date`, fetching it from upstream if allowed. None if nobody has it.'''
+        with self._lock:
+            entry = self._cached.get(date)
+            if entry is not None:
+                self._cached.move_to_end(date)
+                self.hits += 1
+                return entry
+            self.misses += 1
+            rows = self._connection().execute('SELECT data FROM readings WHERE date = ?', (date,)).fetchall()
+        if rows:
+            return self._remember(date, rows[0][0])
+        if not fetch or not self.upstream:
+            return None
+
+        self.put(date, self.fetch(date))
+        return self.get(date, fetch=False)
+
+    def put(self, date: str, response: dict) -> None:
+        readings = response.get('readings') if isinstance(response, dict) else None
+        if not isinstance(readings, list) or not readings:
+            raise ValueError(f'{date}: a readings response needs a non-empty readings list')
+        data = {'success': True, 'date': date, 'readings': readings}
+        blob = zlib.compress(json.dumps(data, separators=(',', ':'), ensure_ascii=False).encode('utf-8'), 9)
+        with self._lock:
+            self._connection().execute(
+                'INSERT INTO readings (date, data, fetched) VALUES (?, ?, ?) '
+                'ON CONFLICT(date) DO UPDATE SET data = excluded.data, fetched = excluded.fetched',
+                (date, blob, time.time())
+            )
+            self._cached.pop(date, None)
+            self._failed.pop(date, None)
+
+    def fetch(self, date: str) -> dict:
+        '''The upstream response for `date`. Raises UpstreamError, and FileNotFoundError if it has no readings.'''
+        failed = self._failed.get(date)
+        if failed is not None and time.monotonic() - failed < self.retry_after:
+            raise UpstreamError(f'{date}: upstream failed recently')
+
+        query = {'date': date, **({'key': self.key} if self.key else {})}
+        try:
+            with urlopen(f'{self.upstream.rstrip("/")}/?{urlencode(query)}', timeout=self.timeout) as resp:
+                data = json.loads(resp.read())
+        except (OSError, ValueError) as e:
+            self._failed[date] = time.monotonic()
+            raise UpstreamError(f'{date}: {type(e).__name__}: {e}') from None
+
+        if not isinstance(data, dict) or not data.get('success') or not isinstance(data.get('readings'), list) or not data['readings']:
+            raise FileNotFoundError(f'{date}: no readings upstream')
+        return data
+
+    def import_files(self, paths: list[Path]) -> list[str]:
+        '''Stores every readings.json-style file in `paths`. Returns the dates imported.'''
+        dates = []
+        for path in paths:
+            data = json.loads(Path(path).read_bytes())
+            date = parse_date(str(data.get('date')))
+            self.put(date, data)
+            dates.append(date)
+        return dates
+
+    def prefetch(self, dates: list[str], workers: int = 4) -> dict[str, str]:
+        '''Fetches every date that is not stored yet. Returns the error for each date that failed.'''
+        with self._lock:
+            stored = {date for date, in self._connection().execute('SELECT date FROM readings')}
+        missing = [date for date in dates if date not in stored]
+        errors = {}
+
+        def one(date):
+            try:
+                self.put(date, self.fetch(date))
+            except (UpstreamError, FileNotFoundError, ValueError) as e:
+                errors[date] = str(e)
+
+        with ThreadPoolExecutor(workers) as executor:
+            list(executor.map(one, missing))
+        return errors
+
+    def stats(self) -> dict:
+        with self._lock:
+            count, size = self._connection().execute('SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0) FROM readings').fetchone()
+            return {'dates': count, 'bytes': size, 'cached': len(self._cached), 'hits': self.hits, 'misses': self.misses}
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Fill the readings store.')
+    parser.add_argument('--db', default=os.getenv('READINGS_DB', 'readings.db'), help='store to fill (default: readings.db)')
+    commands = parser.add_subparsers(dest='command', required=True)
+    imports = commands.add_parser('import', help='store readings.json-style files')
+    imports.add_argument('files', nargs='+', type=Path)
+    prefetch = commands.add_parser('prefetch', help='fetch dates that are not stored yet from the scrape API')
+    prefetch.add_argument('--start', type=parse_date, default=Date.today().strftime('%Y%m%d'), help='first date, yyyymmdd (default: today)')
+    prefetch.add_argument('--days', type=int, default=366, help='how many days from --start (default: 366)')
+    prefetch.add_argument('--sundays', action='store_true', help='only fetch Sundays')
+    prefetch.add_argument('--upstream', default=os.getenv('SCRAPE_SERVER_URL', 'https://universalis.vercel.app/api'))
+    prefetch.add_argument('--key', default=os.getenv('SCRAPE_KEY', os.getenv('API_KEY')))
+    args = parser.parse_args()
+
+    cwd = Path(__file__).parent.resolve()
+    if args.command == 'import':
+        store = ReadingsStore(cwd/args.db)
+        dates = store.import_files(args.files)
+        print(f'imported {len(dates)} dates')
+    else:
+        store = ReadingsStore(cwd/args.db, upstream=args.upstream, key=args.key, timeout=30)
+        start = datetime.strptime(args.start, '%Y%m%d').date()
+        days = [start + timedelta(days=n) for n in range(args.days)]
+        dates = [day.strftime('%Y%m%d') for day in days if not args.sundays or day.weekday() == 6]
+        errors = store.prefetch(dates)
+        for date, error in sorted(errors.items()):
+            print(error)
+        print(f'{len(dates) - len(errors)} of {len(dates)} dates stored')
+    print(store.stats())
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+from functools import lru_cache
+from typing import NamedTuple
+
+VALID_TAGS = frozenset([
+    'br', '_tab',
+    'b', 'i', 'u', 's', 'ul',
+    '/b', '/i', '/u', '/s', '/ul'
+])
+
+# blank lines (`<br><br>`) get an invisible character so they survive blank paragraph removal
+BLANK_LINE = '⠀'
+
+class Run(NamedTuple):
+    text: str
+    # subset of 'bius' (bold, italic, underline, superscript); None for a bare tab run
+    flags: str | None
+
+class Paragraph(NamedTuple):
+    # 'first' (carries the top spacing and tab stop), 'normal' or 'bullet'
+    kind: str
+    runs: tuple[Run, ...]
+    blank: bool
+
+def _flags(ctx: list[str]) -> str:
+    return ''.join(f for f in 'bius' if f in ctx)
+
+def _remove_last(ctx: list[str], tag: str) -> None:
+    for k in range(len(ctx) - 1, -1, -1):
+        if ctx[k] == tag:
+            del ctx[k]
+            return
+
+@lru_cache(maxsize=4096)
+def compile_markup(raw_text: str, tabs: bool = False) -> tuple[Paragraph, ...]:
+    '''
+    Compiles bulletin markup into paragraphs of formatted runs in a single pass.
+    `tabs` enables `<_tab>` (only meaningful when the paragraph has a tab stop).
+    Malformed markup is handled exactly as the original character-by-character parser did.
+    '''
+    text = raw_text.replace('<br><ul>', '<ul>').replace('</ul><br>', '</ul>')
+
+    paragraphs: list[Paragraph] = []
+    kind, runs = 'first', []
+    ctx: list[str] = []
+    txt: list[str] = []
+
+    def new_paragraph(new_kind):
+        nonlocal kind, runs
+        paragraphs.append(Paragraph(kind, tuple(runs), not ''.join(r.text for r in runs).strip()))
+        kind, runs = new_kind, []
+
+    i, n = 0, len(text)
+    intag = None
+    while i < n:
+        if intag is None:
+            j = text.find('<', i)
+            if j == -1:
+                txt.append(text[i:])
+                break
+            txt.append(text[i:j])
+            intag, i = '', j + 1
+            continue
+
+        # inside a tag: a leading '>' is part of the name, anything else runs to the next '<' or '>'
+        start = i + 1 if not intag and text[i] == '>' else i
+        lt, gt = text.find('<', start), text.find('>', start)
+        if lt == -1 and gt == -1:
+            intag += text[i:]
+            break
+        if gt == -1 or (lt != -1 and lt < gt):
+            intag += text[i:lt]
+            if intag:
+                txt.append('<' + intag)
+            intag, i = '', lt + 1
+            continue
+
+        intag += text[i:gt]
+        i = gt + 1
+
+        if txt:
+            joined = ''.join(txt)
+            if joined:
+                runs.append(Run(joined, _flags(ctx)))
+            txt = []
+
+        if intag not in VALID_TAGS:
+            runs.append(Run('<' + intag + '>', _flags(ctx)))
+        elif 'ul' in intag or (ctx and ctx[-1] == 'ul'):
+            if intag == '/ul':
+                del ctx[-1:]
+                new_paragraph('normal')
+            elif intag == 'ul' or intag == 'br':
+                if intag == 'ul':
+                    ctx.append('ul')
+                new_paragraph('bullet')
+        else:
+            if intag.startswith('/') and intag[1:] in ctx:
+                _remove_last(ctx, intag[1:])
+            elif intag == 'br':
+                new_paragraph('normal')
+            elif tabs and intag == '_tab':
+                runs.append(Run('\t', None))
+            else:
+                ctx.append(intag)
+
+        if intag == 'br' and text.startswith('<br>', i):
+            txt.append(BLANK_LINE)
+        intag = None
+
+    runs.append(Run(''.join(txt), _flags(ctx)))
+    if intag:
+        runs.append(Run('<' + intag, _flags(ctx)))
+    new_paragraph(None)
+
+    return tuple(paragraphs)
@@ -0,0 +1,122 @@
+'''
+A small in-process metrics registry rendered in the Prometheus text format (version 0.0.4).
+Each worker process keeps its own numbers; scrape every worker or run a single one.
+'''
+from bisect import bisect_left
+import threading
+
+SECONDS = (.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30, 60)
+BYTES = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(names: tuple[str, ...], values: tuple, extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name, self.help, self.labels = name, help, labels
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, n: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + n
+
+    def render(self) -> list[str]:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_labels(self.labels, labels)} {_number(value)}')
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = (), buckets: tuple[float, ...] = SECONDS):
+        self.name, self.help, self.labels, self.buckets = name, help, labels, buckets
+        # labels -> (count per bucket, +Inf last), sum
+        self._values: dict[tuple, tuple[list[int], float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels) -> None:
+        with self._lock:
+            counts, total = self._values.get(labels) or ([0] * (len(self.buckets) + 1), 0.0)
+            counts[bisect_left(self.buckets, value)] += 1
+            self._values[labels] = counts, total + value
+
+    def render(self) -> list[str]:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for labels, (counts, total) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, n in zip((*self.buckets, '+Inf'), counts):
+                    cumulative += n
+                    le = 'le="+Inf"' if bound == '+Inf' else f'le="{_number(bound)}"'
+                    lines.append(f'{self.name}_bucket{_labels(self.labels, labels, le)} {cumulative}')
+                lines.append(f'{self.name}_sum{_labels(self.labels, labels)} {_number(total)}')
+                lines.append(f'{self.name}_count{_labels(self.labels, labels)} {cumulative}')
+        return lines
+
+class Registry:
+    def __init__(self):
+        self._metrics: list[Counter | Histogram] = []
+        self._collectors = []
+
+    def counter(self, *args, **kwargs) -> Counter:
+        metric = Counter(*args, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, *args, **kwargs) -> Histogram:
+        metric = Histogram(*args, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def collector(self, func):
+        '''
+        Registers `func() -> [(name, type, help, [(labels dict, value), ...]), ...]`, read at
+        scrape time, for numbers that are already counted elsewhere (cache hits, queue depth).
+        '''
+        self._collectors.append(func)
+        return func
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for func in self._collectors:
+            for name, kind, help, samples in func():
+                lines += [f'# HELP {name} {help}', f'# TYPE {name} {kind}']
+                for labels, value in samples:
+                    lines.append(f'{name}{_labels(tuple(labels), tuple(labels.values()))} {_number(value)}')
+        return '\n'.join(lines) + '\n'
+
+registry = Registry()
+
+request_seconds = registry.histogram(
+    'bulletins_request_duration_seconds', 'Time spent handling a request.', ('route', 'method', 'status'))
+request_bytes = registry.histogram(
+    'bulletins_request_size_bytes', 'Size of request bodies.', ('route',), buckets=BYTES)
+response_bytes = registry.histogram(
+    'bulletins_response_size_bytes', 'Size of response bodies with a known length.', ('route',), buckets=BYTES)
+build_seconds = registry.histogram(
+    'bulletins_build_phase_seconds', 'Time spent in each phase of build().', ('phase',))
+build_events = registry.counter(
+    'bulletins_build_events_total', 'parseText calls, paragraphs, runs and cached sections rendered by build().', ('event',))
+pdf_seconds = registry.histogram(
+    'bulletins_pdf_conversion_seconds', 'Time spent converting a DOCX to PDF.', ('converter', 'result'))
+rate_limited = registry.counter(
+    'bulletins_rate_limited_total', 'Requests refused by a parish rate limit.', ('parish',))
+
+def observe_build(profile) -> None:
+    '''Records the spans and counts a `timing.Profile` collected around a build.'''
+    for phase, seconds in profile.spans.items():
+        build_seconds.observe(seconds, phase)
+    for event, n in profile.counts.items():
+        build_events.inc(event, n=n)
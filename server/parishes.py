@@ -0,0 +1,156 @@
+'''
+Parish profiles, so one instance can serve several parishes. PARISHES (default parishes.json)
+gives each parish its API key and, where it differs from the defaults, its fixed texts and limits:
+
+    {"parishes": {
+        "st-marys": {"key": "...", "dpa": "<i>... please speak to Fr Paul ...</i>", "rate": 0.5, "burst": 10},
+        "st-johns": {"key": "...", "root": "/srv/st-johns", "concurrency": 1}
+    }}
+
+A parish keeps everything of its own under `root` (parishes/<name> by default): logo.png, its
+json/ templates, latest.json, schedule.json and cache/. `logo` and `templates` can point
+elsewhere. Without the file there is one parish, `default`, which is the instance as it always
+was: API_KEY, with everything in the server directory.
+'''
+from cache import canonical_json, payload_hash
+from readings import COPYRIGHT, DPA_NOTICE
+
+from dataclasses import dataclass
+from pathlib import Path
+import json
+import os
+import re
+import threading
+import time
+
+# builds one parish can have rendering at once, and queued or running in its job queue
+CONCURRENCY = int(os.getenv('BUILD_WORKERS', 2))
+QUEUE = int(os.getenv('BUILD_QUEUE', 16))
+# builds a second a parish's rate limit refills with (0 turns it off), and how many it can save up
+RATE = float(os.getenv('BUILD_RATE', 1))
+BURST = float(os.getenv('BUILD_BURST', 20))
+
+PARISH_NAME = re.compile(r'[a-zA-Z0-9\-_]+')
+
+class RateLimited(Exception):
+    def __init__(self, wait: float):
+        super().__init__(f'Rate limit exceeded, try again in {wait:.1f}s')
+        self.wait = wait
+
+class TokenBucket:
+    '''`rate` tokens a second, up to `burst` of them saved up.'''
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self, n: float = 1) -> float:
+        '''
+        Takes `n` tokens and returns 0, or takes none and returns the seconds until there will be
+        `n`. More than `burst` costs the whole bucket, so a large request is slowed, not refused.
+        '''
+        if self.rate <= 0:
+            return 0
+        n = min(n, self.burst)
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+            self._stamp = now
+            if self._tokens >= n:
+                self._tokens -= n
+                return 0
+            return (n - self._tokens) / self.rate
+
+    def available(self) -> float:
+        with self._lock:
+            return min(self.burst, self._tokens + (time.monotonic() - self._stamp) * self.rate)
+
+@dataclass(frozen=True, slots=True)
+class Profile:
+    name: str
+    key: str | None
+    root: Path
+    logo: Path
+    templates: Path
+    copyright: str = COPYRIGHT
+    dpa: str = DPA_NOTICE
+    concurrency: int = CONCURRENCY
+    queue: int = QUEUE
+    rate: float = RATE
+    burst: float = BURST
+
+    def assets(self) -> dict:
+        '''The `build_payload` arguments that make a build this parish's.'''
+        return {'logo': str(self.logo), 'copyright': self.copyright, 'dpa_notice': self.dpa}
+
+    def build_id(self, payload) -> str:
+        '''Content address of `payload` built for this parish: the payload, the logo and the fixed texts.'''
+        data = payload.canonical()
+        # the default texts add nothing, so builds cached before profiles existed keep their ids
+        if (self.copyright, self.dpa) != (COPYRIGHT, DPA_NOTICE):
+            data += canonical_json([self.copyright, self.dpa])
+        return payload_hash(data, self.logo)
+
+def profile(name: str, config: dict, base: Path) -> Profile:
+    '''A parish from its entry in the profiles file. Raises ValueError naming the parish for bad entries.'''
+    if not PARISH_NAME.fullmatch(name):
+        raise ValueError(f'parish name {name!r} may only use letters, digits, - and _')
+    if not isinstance(config, dict):
+        raise ValueError(f'{name}: expected an object')
+    unknown = set(config) - {'key', 'root', 'logo', 'templates', 'copyright', 'dpa', 'concurrency', 'queue', 'rate', 'burst'}
+    if unknown:
+        raise ValueError(f'{name}: unknown field {sorted(unknown)[0]!r}')
+    if not isinstance(config.get('key'), str) or not config['key']:
+        raise ValueError(f'{name}: key must be a non-empty string')
+    for text in ('copyright', 'dpa'):
+        if not isinstance(config.get(text, ''), str):
+            raise ValueError(f'{name}: {text} must be a string')
+
+    try:
+        concurrency, queue = int(config.get('concurrency', CONCURRENCY)), int(config.get('queue', QUEUE))
+        rate, burst = float(config.get('rate', RATE)), float(config.get('burst', BURST))
+    except (TypeError, ValueError):
+        raise ValueError(f'{name}: concurrency, queue, rate and burst must be numbers') from None
+    if concurrency < 1 or queue < 1 or rate < 0 or burst < 1:
+        raise ValueError(f'{name}: concurrency, queue and burst must be at least 1 and rate at least 0')
+
+    root = base/config.get('root', Path('parishes')/name)
+    # every build and build id reads it, so a parish without one could never build
+    logo = root/config.get('logo', 'logo.png')
+    if not logo.is_file():
+        raise ValueError(f'{name}: no logo at {logo}')
+    return Profile(
+        name=name,
+        key=config['key'],
+        root=root,
+        logo=logo,
+        templates=root/config.get('templates', 'json'),
+        copyright=config.get('copyright', COPYRIGHT),
+        dpa=config.get('dpa', DPA_NOTICE),
+        concurrency=concurrency,
+        queue=queue,
+        rate=rate,
+        burst=burst,
+    )
+
+def load_profiles(path: Path, base: Path, default_key: str | None) -> dict[str | None, Profile]:
+    '''Every parish in the profiles file at `path` by API key, or just `default` if there is no file.'''
+    path = Path(path)
+    if not path.exists():
+        return {default_key: Profile('default', default_key, base, base/'logo.png', base/'json')}
+
+    config = json.loads(path.read_bytes())
+    parishes = config.get('parishes') if isinstance(config, dict) else None
+    if not isinstance(parishes, dict) or not parishes:
+        raise ValueError(f'{path}: "parishes" must map at least one name to a profile')
+
+    profiles = {}
+    for name, entry in parishes.items():
+        found = profile(name, entry, base)
+        if found.key in profiles:
+            raise ValueError(f'{name}: key already belongs to {profiles[found.key].name}')
+        profiles[found.key] = found
+    return profiles
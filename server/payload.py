@@ -0,0 +1,251 @@
+'''
+The editor payload (the JSON posted to /build) as slotted dataclasses. `parse` checks the whole
+payload in one pass, so bad input is rejected before anything is rendered, and normalizes the text
+once instead of in every consumer.
+'''
+from cache import canonical_json
+from readings import READING_TYPES
+
+from dataclasses import dataclass, fields
+import math
+
+@dataclass(slots=True, frozen=True)
+class InfoLine:
+    align: int
+    lines: float
+    text: str
+
+@dataclass(slots=True, frozen=True)
+class InfoGroup:
+    '''One latest-info row: its lines, plus an optional side text merged down the right.'''
+    side_size: float
+    side: str
+    lines: tuple[InfoLine, ...]
+
+@dataclass(slots=True, frozen=True)
+class Front:
+    top_margin: float
+    left_margin: float
+    title: str
+    title_size: float
+    church_title: str
+    church_title_size: float
+    church_info: str
+    church_info_size: float
+    mass_info: tuple[str, ...]
+    mass_info_size: float
+    latest_info: tuple[InfoGroup, ...]
+    latest_info_size: float
+    latest_info_side_width: float
+
+@dataclass(slots=True, frozen=True)
+class Notice:
+    size: float
+    margin: float
+    text: str
+
+@dataclass(slots=True, frozen=True)
+class Reading:
+    type: str
+    left: bool
+    alt: bool
+    ref: str
+    title: str
+    size: float
+    margin: float
+    # psalms are (response, verses)
+    text: str | tuple[str, str]
+    sameline: bool = True
+    include: bool = True
+
+@dataclass(slots=True, frozen=True)
+class ReadingOptions:
+    top_margin: float
+    left_margin: float
+    heading_spacing: float
+    heading_size: float
+    copyright_spacing: float
+    copyright_size: float
+    copyright_page: int
+    dpa_page: int
+
+@dataclass(slots=True, frozen=True)
+class Payload:
+    front: Front
+    back: tuple[Notice, ...]
+    readings: tuple[Reading, ...]
+    options: ReadingOptions
+
+    def to_json(self) -> dict:
+        '''The payload in the editor's shape, normalized: unknown keys dropped, text cleaned up, whole floats as ints.'''
+        front = _json(self.front)
+        front['mass-info'] = list(self.front.mass_info)
+        front['latest-info'] = [
+            [[group.side_size, group.side], *([line.align, line.lines, line.text] for line in group.lines)]
+            for group in self.front.latest_info
+        ]
+        readings = []
+        for reading in self.readings:
+            reading = _json(reading)
+            if isinstance(reading['text'], tuple):
+                reading['text'] = list(reading['text'])
+            readings.append(reading)
+        return {
+            'front': front,
+            'back': [[notice.size, notice.margin, notice.text] for notice in self.back],
+            'readings': {'options': _json(self.options), 'readings': readings},
+        }
+
+    def canonical(self) -> bytes:
+        '''Stable bytes for the payload: equal for any two payloads that build the same document.'''
+        return canonical_json(self.to_json())
+
+def _json(obj) -> dict:
+    return {f.name.replace('_', '-'): getattr(obj, f.name) for f in fields(obj)}
+
+class _Fields:
+    '''Reads and checks the values of one JSON object, naming `path` in every error.'''
+
+    def __init__(self, obj, path: str):
+        if not isinstance(obj, dict):
+            raise ValueError(f'{path} must be an object')
+        self.obj = obj
+        self.path = path
+
+    def get(self, key: str, default=None):
+        if key not in self.obj:
+            if default is None:
+                raise ValueError(f'{self.path}.{key} is missing')
+            return default
+        return self.obj[key]
+
+    def number(self, key: str, positive: bool = False) -> float:
+        return number(self.get(key), f'{self.path}.{key}', positive)
+
+    def text(self, key: str) -> str:
+        return text(self.get(key), f'{self.path}.{key}')
+
+    def flag(self, key: str, default: bool | None = None) -> bool:
+        value = self.get(key, default)
+        if not isinstance(value, (bool, int)) or value not in (0, 1):
+            raise ValueError(f'{self.path}.{key} must be true or false')
+        return bool(value)
+
+    def list(self, key: str) -> list:
+        return array(self.get(key), f'{self.path}.{key}')
+
+def number(value, path: str, positive: bool = False) -> float:
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value) or value < 0 or (positive and value == 0):
+        raise ValueError(f'{path} must be a {"positive" if positive else "non-negative"} number')
+    return int(value) if value == int(value) else value
+
+def text(value, path: str) -> str:
+    if not isinstance(value, str):
+        raise ValueError(f'{path} must be a string')
+    return value
+
+def array(value, path: str, length: int | None = None) -> list:
+    if not isinstance(value, (list, tuple)):
+        raise ValueError(f'{path} must be a list')
+    if length is not None and len(value) != length:
+        raise ValueError(f'{path} must have {length} items')
+    return value
+
+def page(value, path: str) -> int:
+    if number(value, path) not in (0, 1):
+        raise ValueError(f'{path} must be 0 (left) or 1 (right)')
+    return int(value)
+
+def parse_front(front, path: str = 'front') -> Front:
+    f = _Fields(front, path)
+    groups = []
+    for n, group in enumerate(f.list('latest-info')):
+        group_path = f'{path}.latest-info[{n}]'
+        if len(array(group, group_path)) < 2:
+            raise ValueError(f'{group_path} must have a side and at least one line')
+        side_size, side = array(group[0], f'{group_path}[0]', 2)
+        lines = []
+        for m, line in enumerate(group[1:], 1):
+            align, lines_, txt = array(line, f'{group_path}[{m}]', 3)
+            lines.append(InfoLine(number(align, f'{group_path}[{m}][0]'), number(lines_, f'{group_path}[{m}][1]'), text(txt, f'{group_path}[{m}][2]')))
+        groups.append(InfoGroup(number(side_size, f'{group_path}[0][0]'), text(side, f'{group_path}[0][1]'), tuple(lines)))
+
+    return Front(
+        top_margin=f.number('top-margin'),
+        left_margin=f.number('left-margin'),
+        title=f.text('title').replace('\n', ''),
+        title_size=f.number('title-size', positive=True),
+        church_title=f.text('church-title').replace('\n', ''),
+        church_title_size=f.number('church-title-size', positive=True),
+        church_info=f.text('church-info').replace('\n', ''),
+        church_info_size=f.number('church-info-size', positive=True),
+        mass_info=tuple(text(txt, f'{path}.mass-info[{n}]').replace('\n', '') for n, txt in enumerate(f.list('mass-info'))),
+        mass_info_size=f.number('mass-info-size', positive=True),
+        latest_info=tuple(groups),
+        latest_info_size=f.number('latest-info-size', positive=True),
+        latest_info_side_width=f.number('latest-info-side-width'),
+    )
+
+def parse_back(back, path: str = 'back') -> tuple[Notice, ...]:
+    notices = []
+    for n, notice in enumerate(array(back, path)):
+        size, margin, txt = array(notice, f'{path}[{n}]', 3)
+        notices.append(Notice(
+            number(size, f'{path}[{n}][0]', positive=True),
+            number(margin, f'{path}[{n}][1]'),
+            text(txt, f'{path}[{n}][2]').replace('\n', ''),
+        ))
+    return tuple(notices)
+
+def parse_reading(reading, path: str) -> Reading:
+    f = _Fields(reading, path)
+    kind = f.get('type')
+    if not isinstance(kind, str) or kind not in READING_TYPES:
+        raise ValueError(f'{path}.type must be one of {", ".join(READING_TYPES)}')
+    if kind == 'psalm':
+        response, verses = array(f.get('text'), f'{path}.text', 2)
+        body = (text(response, f'{path}.text[0]'), text(verses, f'{path}.text[1]'))
+    else:
+        body = f.text('text')
+
+    return Reading(
+        type=kind,
+        left=f.flag('left'),
+        alt=f.flag('alt'),
+        ref=f.text('ref'),
+        title=f.text('title'),
+        size=f.number('size', positive=True),
+        margin=f.number('margin'),
+        text=body,
+        sameline=f.flag('sameline', True),
+        include=f.flag('include', True),
+    )
+
+def parse_readings(readings, path: str = 'readings.readings') -> tuple[Reading, ...]:
+    return tuple(parse_reading(reading, f'{path}[{n}]') for n, reading in enumerate(array(readings, path)))
+
+def parse_options(options, path: str = 'readings.options') -> ReadingOptions:
+    f = _Fields(options, path)
+    return ReadingOptions(
+        top_margin=f.number('top-margin'),
+        left_margin=f.number('left-margin'),
+        heading_spacing=f.number('heading-spacing'),
+        heading_size=f.number('heading-size', positive=True),
+        copyright_spacing=f.number('copyright-spacing'),
+        copyright_size=f.number('copyright-size', positive=True),
+        copyright_page=page(f.get('copyright-page'), f'{path}.copyright-page'),
+        dpa_page=page(f.get('dpa-page'), f'{path}.dpa-page'),
+    )
+
+def parse(data) -> Payload:
+    '''The checked payload. Raises ValueError naming the first bad field.'''
+    if isinstance(data, Payload):
+        return data
+    f = _Fields(data, 'payload')
+    readings = _Fields(f.get('readings'), 'readings')
+    return Payload(
+        front=parse_front(f.get('front')),
+        back=parse_back(f.get('back')),
+        readings=parse_readings(readings.get('readings')),
+        options=parse_options(readings.get('options')),
+    )
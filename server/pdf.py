@@ -0,0 +1,135 @@
+from cache import BuildCache, atomic_path, file_hash
+from metrics import pdf_seconds
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+SOFFICE = os.getenv('SOFFICE', 'soffice')
+
+def docx2pdf_convert(src: Path, dst: Path) -> None:
+    '''Microsoft Word through docx2pdf (Windows/macOS).'''
+    if sys.platform == 'win32':
+        # Word is driven over COM, which has to be initialised on every worker thread
+        import pythoncom
+        pythoncom.CoInitialize()
+    from docx2pdf import convert
+    convert(str(src), str(dst))
+
+def soffice_convert(src: Path, dst: Path) -> None:
+    '''Headless LibreOffice. Each call gets its own profile so conversions can run side by side.'''
+    with tempfile.TemporaryDirectory(dir=Path(dst).parent) as tmp:
+        tmp = Path(tmp)
+        subprocess.run([
+            SOFFICE, '--headless', '--norestore',
+            f'-env:UserInstallation={(tmp/"profile").as_uri()}',
+            '--convert-to', 'pdf', '--outdir', str(tmp), str(src)
+        ], check=True, capture_output=True, timeout=180)
+        os.replace(tmp/(Path(src).stem + '.pdf'), dst)
+
+STUB_PDF = (
+    b'%PDF-1.4\n1 0 obj<</Type/Catalog/Pages 2 0 R>>endobj\n'
+    b'2 0 obj<</Type/Pages/Kids[3 0 R]/Count 1>>endobj\n'
+    b'3 0 obj<</Type/Page/Parent 2 0 R/MediaBox[0 0 842 595]>>endobj\n'
+    b'trailer<</Root 1 0 R>>\n%%EOF\n'
+)
+
+def stub_convert(src: Path, dst: Path) -> None:
+    '''Blank landscape A4 page, for tests and machines without an office suite.'''
+    Path(dst).write_bytes(STUB_PDF)
+
+CONVERTERS = {
+    'docx2pdf': docx2pdf_convert,
+    'soffice': soffice_convert,
+    'stub': stub_convert,
+}
+
+def default_converter() -> str:
+    name = os.getenv('PDF_CONVERTER')
+    if name:
+        return name
+    if sys.platform.startswith('linux') and shutil.which(SOFFICE):
+        return 'soffice'
+    return 'docx2pdf'
+
+class PdfPipeline:
+    '''
+    Converts DOCX files to PDF in the background and stores the result by the DOCX content hash.
+    Concurrent requests for the same document share one job. Conversions started ahead of a
+    request (`preconvert`) replace each other while still queued, so only the newest waits.
+    '''
+
+    def __init__(self, store: BuildCache, converter: str | None = None, workers: int = 1):
+        self.store = store
+        self.converter = converter or default_converter()
+        self.convert = CONVERTERS[self.converter]
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix='pdf')
+        self._jobs: dict[str, Future] = {}
+        self._errors: dict[str, str] = {}
+        # the queued pre-conversion nobody has asked for yet, which the next one may cancel
+        self._ahead: str | None = None
+        self._lock = threading.Lock()
+
+    def get(self, digest: str) -> Path | None:
+        return self.store.get(digest, 'pdf')
+
+    def submit(self, docx: Path) -> tuple[str, Future | None]:
+        '''Starts (or joins) the conversion of `docx`. The future is None when the PDF already exists.'''
+        digest = file_hash(docx)
+        with self._lock:
+            if self._ahead == digest:
+                # wanted now, so no longer the pre-conversion's to cancel
+                self._ahead = None
+            return digest, self._start(digest, docx)
+
+    def preconvert(self, docx: Path) -> None:
+        '''
+        Starts converting `docx` before anyone asks for it, cancelling the previous pre-conversion
+        if that has not started yet: of a run of preview builds, only the latest is worth having.
+        '''
+        digest = file_hash(docx)
+        with self._lock:
+            previous = self._jobs.get(self._ahead) if self._ahead != digest else None
+            if previous is not None and previous.cancel():
+                del self._jobs[self._ahead]
+            self._ahead = digest if self._start(digest, docx) is not None else None
+
+    def _start(self, digest: str, docx: Path) -> Future | None:
+        if digest in self._jobs:
+            return self._jobs[digest]
+        if self.store.get(digest, 'pdf') is not None:
+            return None
+
+        self._errors.pop(digest, None)
+        job = self._jobs[digest] = self._executor.submit(self._run, digest, Path(docx))
+        return job
+
+    def _run(self, digest: str, docx: Path) -> Path:
+        path = self.store.path(digest, 'pdf')
+        start = time.perf_counter()
+        try:
+            with atomic_path(path) as tmp:
+                self.convert(docx, tmp)
+        except Exception as e:
+            pdf_seconds.observe(time.perf_counter() - start, self.converter, 'failed')
+            with self._lock:
+                self._errors[digest] = f'{type(e).__name__}: {e}'
+            raise
+        finally:
+            with self._lock:
+                self._jobs.pop(digest, None)
+
+        pdf_seconds.observe(time.perf_counter() - start, self.converter, 'done')
+        self.store.evict()
+        return path
+
+    def error(self, digest: str) -> str | None:
+        '''The last failure for `digest`, cleared once read so the next request retries.'''
+        with self._lock:
+            return self._errors.pop(digest, None)
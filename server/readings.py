@@ -0,0 +1,90 @@
+READING_TYPES = {
+    'reading1': 'FIRST READING',
+    'psalm': 'RESPONSORIAL PSALM',
+    'reading2': 'SECOND READING',
+    'acclamation': 'GOSPEL ACCLAMATION',
+    'gospel': 'GOSPEL'
+}
+
+COPYRIGHT = '''<i>The text of Sacred Scripture in the Lectionary is from the English Standard Version of the Bible, Catholic Edition (ESV-CE), published by Asian Trading Corporation, \u00a9 2017 Crossway. All rights are reserved. The English Standard Version of the Bible, Catholic Edition is published in the United Kingdom by SPCK Publishing. The Psalms and Canticles are from Abbey Psalms and Canticles \u00a9 2018 United States Conference of Catholic Bishops. Reprinted with permission.</i>'''
+DPA_NOTICE = '''<i>Please note the Data Protection Act 2018 restricts the inclusion of the names of our sick unless their consent is given. If you wish to include someone\u2019s name here please speak to Fr John on completing a Consent Form from the sacristy.</i>'''
+
+# what a template decides about a reading, as opposed to its text
+LAYOUT_KEYS = ('include', 'left', 'size', 'margin', 'sameline')
+
+def reading_layouts(readings: list[dict]) -> dict:
+    '''
+    How `readings` (a template's, in `build()` shape) lay out each kind of reading, by (type, alt)
+    and by type alone for kinds the template has no exact match for.
+    '''
+    layouts = {}
+    for reading in readings:
+        layout = {key: reading[key] for key in LAYOUT_KEYS if key in reading}
+        layouts.setdefault((reading['type'], bool(reading.get('alt'))), layout)
+        layouts.setdefault(reading['type'], layout)
+    return layouts
+
+def reading_block(reading: dict, layouts: dict | None = None) -> dict:
+    '''
+    A scraped reading (readings.json) in the shape `build()` expects, as the editor would send it.
+    `layouts` (from `reading_layouts`) takes precedence over the scraped defaults.
+    '''
+    text = reading['text']
+    if reading['type'] == 'psalm':
+        text = [text[0], '<br><br>'.join('<br>'.join(stanza) for stanza in text[1:])]
+    else:
+        text = '<br>'.join(text)
+
+    layout = {}
+    if layouts:
+        layout = layouts.get((reading['type'], bool(reading['alt']))) or layouts.get(reading['type'], {})
+    return {
+        'include': layout.get('include', True),
+        'left': layout.get('left', reading.get('left', reading['type'] not in ('acclamation', 'gospel'))),
+        'size': layout.get('size', reading.get('size', 11)),
+        'margin': layout.get('margin', reading.get('margin', 20)),
+        'type': reading['type'],
+        'alt': reading['alt'],
+        'ref': reading['ref'] or '',
+        'title': reading['title'] or '',
+        'sameline': layout.get('sameline', reading.get('sameline', True)),
+        'text': text,
+    }
+
+def reading_blocks(scraped: dict, layouts: dict | None = None) -> list[dict]:
+    '''`build()` readings from a whole readings.json-style response (`date` plus `readings`).'''
+    return [reading_block(r, layouts) for r in scraped['readings']]
+
+def reading_texts(readings, heading_size, heading_spacing):
+    '''
+    The text that lays out `readings` (`payload.Reading`s), in order, as (left, markup, size, pbottom, heading).
+    `heading` marks the line with the reference right-aligned on a tab stop. Shared by `build()`
+    and the layout estimate so both see exactly the same paragraphs.
+    '''
+    shown_types = []
+    for reading in readings:
+        if not reading.include:
+            continue
+        alt_reading = reading.alt and reading.type in shown_types
+        left = reading.left
+
+        yield left, ('<b>'
+            + ('OR' if alt_reading else READING_TYPES[reading.type])
+            + ('</b>  <i>wording may differ if sung</i>' if reading.type in ['psalm', 'acclamation'] and not alt_reading and reading.sameline else '</b>')
+            + '<_tab>'
+            + reading.ref), heading_size, heading_spacing, True
+        shown_types.append(reading.type)
+
+        if reading.title:
+            yield left, '<b><i>' + reading.title + '</i></b>', heading_size, heading_spacing, False
+        if reading.type in ['reading1', 'reading2', 'gospel']:
+            yield left, reading.text, reading.size, reading.margin, False
+        if reading.type in ['psalm', 'acclamation']:
+            if not reading.sameline and not alt_reading:
+                yield left, '<i>wording may differ if sung</i>', heading_size, heading_spacing, False
+
+            if reading.type == 'psalm':
+                yield left, '<b>' + reading.text[0] + '</b>', reading.size, heading_spacing, False
+                yield left, reading.text[1], reading.size, reading.margin, False
+            else:
+                yield left, '<b>Alleluia, alleluia.</b><br>' + reading.text + '<br><b>Alleluia.</b>', reading.size, reading.margin, False
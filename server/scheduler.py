@@ -0,0 +1,97 @@
+from templates import JsonFile
+
+from datetime import date as Date, timedelta
+from pathlib import Path
+import threading
+import time
+
+class Scheduler:
+    '''
+    Renders the upcoming issues listed in a schedule file in a background thread, so they are
+    already in the build and PDF caches when someone asks for them:
+
+        {"interval": 3600, "bulletins": [{"template": "Sunday", "weeks": 4, "weekday": 6, "pdf": true}]}
+
+    `weekday` is 0 for Monday to 6 for Sunday (the default). Every pass calls
+    `render(template, yyyymmdd, pdf)` for the next `weeks` issues; anything already cached costs a
+    hash and a lookup, so a pass only really renders what changed. The file is re-read when it
+    changes, and `invalidate` (called when a template is saved) starts a pass straight away.
+    '''
+
+    def __init__(self, config: Path, render, interval: float = 3600):
+        self.config = JsonFile(config)
+        self.render = render
+        self.interval = interval
+        self.last_run = None
+        self._entries: dict[tuple[str, str], dict] = {}
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def enabled(self) -> bool:
+        return self.config.path.exists()
+
+    def issues(self, today: Date | None = None) -> list[tuple[str, str, bool]]:
+        '''(template, yyyymmdd, pdf) for every scheduled issue from `today` on.'''
+        today = today or Date.today()
+        config = self.config.load()[0]
+        issues = []
+        for bulletin in config.get('bulletins', []):
+            weekday = int(bulletin.get('weekday', 6))
+            first = today + timedelta(days=(weekday - today.weekday()) % 7)
+            for week in range(int(bulletin.get('weeks', 4))):
+                day = first + timedelta(weeks=week)
+                issues.append((bulletin['template'], day.strftime('%Y%m%d'), bool(bulletin.get('pdf', True))))
+        return issues
+
+    def run_once(self) -> list[dict]:
+        '''Renders every scheduled issue that is not cached yet. Returns the state of each.'''
+        issues = self.issues()
+        for template, date, pdf in issues:
+            entry = {'template': template, 'date': date, 'status': 'running'}
+            with self._lock:
+                self._entries[template, date] = entry
+            start = time.perf_counter()
+            try:
+                entry['id'] = self.render(template, date, pdf)
+                entry['status'] = 'done'
+            except Exception as e:
+                entry['status'] = 'failed'
+                entry['error'] = f'{type(e).__name__}: {e}'
+            entry['ms'] = round((time.perf_counter() - start) * 1000, 1)
+
+        scheduled = {(template, date) for template, date, _ in issues}
+        with self._lock:
+            # issues that have gone by, or were dropped from the schedule
+            self._entries = {key: entry for key, entry in self._entries.items() if key in scheduled}
+            self.last_run = time.time()
+            return list(self._entries.values())
+
+    def _loop(self) -> None:
+        while True:
+            self._wake.clear()
+            try:
+                interval = float(self.config.load()[0].get('interval', self.interval))
+                self.run_once()
+            except (OSError, ValueError, TypeError, KeyError):
+                # a half-written or broken schedule; try again next time
+                interval = self.interval
+            self._wake.wait(interval)
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name='scheduler', daemon=True)
+            self._thread.start()
+
+    def invalidate(self, template: str) -> None:
+        '''Marks the issues of `template` stale and starts a pass, if `template` is scheduled.'''
+        with self._lock:
+            stale = [entry for (name, _), entry in self._entries.items() if name == template]
+            for entry in stale:
+                entry['status'] = 'stale'
+        if stale:
+            self._wake.set()
+
+    def status(self) -> dict:
+        with self._lock:
+            return {'last_run': self.last_run, 'issues': [dict(entry) for entry in self._entries.values()]}
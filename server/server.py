@@ -1,20 +1,188 @@
-from bulletin import build
+from cache import BuildCache, atomic_path, canonical_json, file_hash, write_atomic
+from batch import batch_items, pool, render
+from db import Database
+from delta import apply_patch
+from encoding import DecodeRequests, compress, negotiate
+from jobs import JobQueue, QueueFull
+from layout import autofit, line_count, preflight
+from lectionary import ReadingsStore, UpstreamError, parse_date
+from markup import compile_markup
+from metrics import observe_build, rate_limited, registry, request_bytes, request_seconds, response_bytes
+from parishes import Profile, RateLimited, TokenBucket, load_profiles
+from payload import parse
+from pdf import PdfPipeline
+from readings import reading_blocks, reading_layouts
+from scheduler import Scheduler
+from templates import JsonFile, TemplateStore
+from timing import begin, end, profiling
+from zipstream import ZipStream
 
-from flask import Flask, request, abort, send_file
+from flask import Flask, Response, g, request, abort, jsonify, send_file, url_for
 from flask_cors import CORS
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from functools import partial
 from pathlib import Path
-from docx2pdf import convert
+import hashlib
 import json
+import math
 import os
 import re
+import threading
+import time
 
 cwd = Path(__file__).parent.resolve()
 app = Flask('Bulletins', template_folder=cwd/'templates', static_folder=cwd/'static')
-CORS(app)
+CORS(app, expose_headers=['Retry-After'])
 app.secret_key = os.getenv('key')
 
 API_KEY = os.getenv('API_KEY')
 
+# gzip/deflate (and br) request bodies are decoded before Flask reads them, up to MAX_BODY_MB decoded
+app.wsgi_app = DecodeRequests(app.wsgi_app, max_bytes=int(os.getenv('MAX_BODY_MB', 16)) * 2**20)
+
+BUILD_ID = re.compile(r'[0-9a-f]{64}')
+
+# DATABASE=bulletins.db keeps templates, the latest payload and the build history in SQLite, one per
+# parish under its root. An absolute path is one file, so it is only allowed with a single parish
+DATABASE = os.getenv('DATABASE')
+# SCHEDULE (default schedule.json) lists the templates to pre-render for the coming weeks
+SCHEDULE = os.getenv('SCHEDULE', 'schedule.json')
+# payloads recently posted to /build, per parish: what `?base=` deltas are applied to
+DELTA_BASES = int(os.getenv('DELTA_BASES', 64))
+
+class Parish:
+    '''
+    A parish profile with everything the server keeps for it, all under the parish's own root:
+    templates, the latest payload, the build and PDF caches, the build queue and the schedule.
+    Every build for the parish (queued, batched, scheduled or rebuilt from history) takes one of
+    its `concurrency` slots, and the builds it asks for come out of its token bucket, so a busy
+    parish waits on its own limits rather than everyone's.
+    '''
+
+    def __init__(self, profile: Profile):
+        self.profile = profile
+        self.name = profile.name
+        self.root = root = profile.root
+        self.build_cache = BuildCache(
+            root/'cache'/'build',
+            max_bytes=int(os.getenv('BUILD_CACHE_MB', 64)) * 2**20,
+            max_count=int(os.getenv('BUILD_CACHE_COUNT', 200)),
+            max_age=float(os.getenv('BUILD_CACHE_DAYS', 7)) * 86400,
+        )
+        self.pdf_pipeline = PdfPipeline(
+            BuildCache(root/'cache'/'pdf', max_bytes=int(os.getenv('PDF_CACHE_MB', 128)) * 2**20),
+            converter=os.getenv('PDF_CONVERTER'),
+            workers=int(os.getenv('PDF_WORKERS', 1)),
+        )
+
+        self.database = None
+        if DATABASE:
+            self.database = Database(root/DATABASE)
+            self.database.import_templates(profile.templates)
+            self.template_store = self.database.templates
+        else:
+            self.template_store = TemplateStore(profile.templates)
+        self.latest_file = JsonFile(root/'latest.json')
+
+        self.slots = threading.BoundedSemaphore(profile.concurrency)
+        self.bucket = TokenBucket(profile.rate, profile.burst)
+        # waits on the shared batch pool for this parish's batch items, a slot at a time
+        self.batch_threads = ThreadPoolExecutor(profile.concurrency, thread_name_prefix=f'batch-{self.name}')
+        self.build_jobs = JobQueue(
+            root/'cache'/'jobs',
+            partial(run_build, self),
+            workers=profile.concurrency,
+            max_pending=profile.queue,
+        )
+        self.scheduler = Scheduler(root/SCHEDULE, partial(prerender, self))
+
+        self.recent_payloads: OrderedDict[str, dict] = OrderedDict()
+        self.recent_payloads_lock = threading.Lock()
+
+    def stats(self) -> dict:
+        return {
+            'concurrency': self.profile.concurrency,
+            'rate': self.profile.rate,
+            'burst': self.profile.burst,
+            'tokens': round(self.bucket.available(), 2),
+        }
+
+# readings by date; dates that are not stored yet are fetched from the scrape API (SCRAPE_SERVER_URL= turns that off)
+readings_store = ReadingsStore(
+    cwd/os.getenv('READINGS_DB', 'readings.db'),
+    upstream=os.getenv('SCRAPE_SERVER_URL', 'https://universalis.vercel.app/api'),
+    key=os.getenv('SCRAPE_KEY', API_KEY),
+    timeout=float(os.getenv('SCRAPE_TIMEOUT', 5)),
+)
+
+# SERVER_TIMING=1 adds the header to every response; otherwise only to requests with `?timing=1`
+SERVER_TIMING = bool(os.getenv('SERVER_TIMING'))
+
+@app.before_request
+def start_timing():
+    g.start = time.perf_counter()
+    g.profile, g.profile_token = begin()
+
+@app.after_request
+def record_timing(response):
+    elapsed = time.perf_counter() - g.start
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    request_seconds.observe(elapsed, route, request.method, response.status_code)
+    if request.content_length:
+        request_bytes.observe(request.environ.get('bulletins.wire_length', request.content_length), route)
+    if response.content_length is not None and not response.is_streamed:
+        response_bytes.observe(response.content_length, route)
+
+    if SERVER_TIMING or request.args.get('timing'):
+        response.headers['Server-Timing'] = g.profile.server_timing(elapsed)
+        response.headers['Timing-Allow-Origin'] = '*'
+    return response
+
+# bodies smaller than this go out uncompressed; the headers would eat most of the saving
+MIN_COMPRESS = int(os.getenv('MIN_COMPRESS_BYTES', 1024))
+COMPRESSIBLE = ('application/json', 'text/plain', 'text/html')
+# compressed bodies by (etag, coding), so an unchanged template or payload is compressed once
+_compressed: OrderedDict[tuple[str, str], bytes] = OrderedDict()
+_compressed_lock = threading.Lock()
+
+@app.after_request
+def compress_response(response):
+    '''
+    Compresses JSON and text bodies for clients that accept it. Registered after `record_timing`,
+    so it runs first and the size metrics see what actually went over the wire.
+    '''
+    if (response.direct_passthrough or response.is_streamed or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE or response.status_code in (204, 304)):
+        return response
+    response.vary.add('Accept-Encoding')
+    coding = negotiate(request.headers.get('Accept-Encoding'))
+    if coding is None or (response.content_length or 0) < MIN_COMPRESS:
+        return response
+
+    etag, _ = response.get_etag()
+    with _compressed_lock:
+        body = _compressed.get((etag, coding)) if etag else None
+    if body is None:
+        body = compress(response.get_data(), coding)
+        if etag:
+            with _compressed_lock:
+                _compressed[etag, coding] = body
+                while len(_compressed) > 64:
+                    _compressed.popitem(last=False)
+    response.set_data(body)
+    response.headers['Content-Encoding'] = coding
+    if etag:
+        # the same entity, encoded; If-None-Match is compared weakly so 304s still work
+        response.set_etag(etag, weak=True)
+    return response
+
+@app.teardown_request
+def stop_timing(error=None):
+    token = g.pop('profile_token', None)
+    if token is not None:
+        end(token)
+
 @app.route('/')
 def index():
     abort(403)
@@ -25,118 +193,591 @@ def ping():
 
 @app.route('/check')
 def check():
-    return {'valid': request.args.get('key') == API_KEY}, 200
+    parish = parishes.get(request.args.get('key'))
+    if parish is None:
+        return {'valid': False}, 200
+    return {'valid': True, 'parish': parish.name}, 200
+
+@app.errorhandler(RateLimited)
+def too_many_builds(e):
+    return {'success': False, 'error': str(e)}, 429, {'Retry-After': str(math.ceil(e.wait))}
+
+def charge(parish: Parish, builds: int = 1) -> None:
+    '''Takes `builds` from the parish's rate limit, or raises RateLimited (a 429) if it has run out.'''
+    wait = parish.bucket.take(builds)
+    if wait:
+        rate_limited.inc(parish.name)
+        raise RateLimited(wait)
+
+def ensure_build(parish: Parish, data: dict, charged: bool = True) -> tuple[str, bool]:
+    '''
+    (build id, whether it was cached), building `data` into the parish's cache if needed. Unless
+    it is `charged` for already, a build that is not cached comes out of the parish's rate limit.
+    '''
+    payload = parse(data)
+    build_id = parish.profile.build_id(payload)
+
+    cached = parish.build_cache.lookup(build_id) is not None
+    if not cached:
+        if not charged:
+            charge(parish)
+        # python-docx is only needed once something is actually built
+        from bulletin import build_payload
+        with parish.slots, profiling() as profile, atomic_path(parish.build_cache.path(build_id)) as tmp:
+            build_payload(payload, tmp, **parish.profile.assets())
+        observe_build(profile)
+        parish.build_cache.evict()
+    return build_id, cached
 
 @app.route('/build', methods=['POST'])
 def build_file():
     key = request.args.get('key')
-    if key != API_KEY:
+    parish = parishes.get(key)
+    if parish is None:
         abort(403)
 
     data = request.get_json()
-    build(
-        OUTPUT_PATH='output.docx',
-        front_page_margins=(data['front']['top-margin'], data['front']['left-margin']),
-        info_data=data['front']['latest-info'],
-        info_size=data['front']['latest-info-size'],
-        info_side_width=data['front']['latest-info-side-width'],
-        title=data['front']['title'],
-        title_size=data['front']['title-size'],
-        church_title=data['front']['church-title'],
-        church_title_size=data['front']['church-title-size'],
-        church_info=data['front']['church-info'],
-        church_info_size=data['front']['church-info-size'],
-        mass_info=data['front']['mass-info'],
-        mass_info_size=data['front']['mass-info-size'],
-        data=data['back'],
-        readings=data['readings']['readings'],
-        reading_margins=(data['readings']['options']['top-margin'], data['readings']['options']['left-margin']),
-        reading_heading_spacing=data['readings']['options']['heading-spacing'],
-        reading_heading_size=data['readings']['options']['heading-size'],
-        copyright_size=data['readings']['options']['copyright-size'],
-        copyright_spacing=data['readings']['options']['copyright-spacing'],
-        copyright_page=data['readings']['options']['copyright-page'],
-        dpa_page=data['readings']['options']['dpa-page'],
-    )
-
-    with open(cwd/'latest.json', 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=4)
+    base = request.args.get('base')
+    if base is not None:
+        with parish.recent_payloads_lock:
+            found = parish.recent_payloads.get(base)
+        if found is None:
+            # forgotten, or posted to another worker: the editor sends the whole payload instead
+            return {'success': False, 'error': 'Unknown base payload'}, 409
 
-    return {'success': True}, 200
+    fit = None
+    try:
+        if base is not None:
+            data = apply_patch(found, data)
+        digest = remember_payload(parish, data)
+        data = resolve_readings(parish, data)
+        if request.args.get('autofit'):
+            # solved on estimates, so the only render is the final one
+            data, fit = autofit(
+                data,
+                min_size=float(request.args.get('min_size', 7)),
+                max_size=float(request.args.get('max_size', 12)),
+                copyright=parish.profile.copyright,
+                dpa_notice=parish.profile.dpa,
+            )
+        # rejected here rather than halfway through a queued build
+        payload = parse(data)
+    except FileNotFoundError as e:
+        return {'success': False, 'error': str(e)}, 404
+    except UpstreamError as e:
+        return {'success': False, 'error': f'Readings upstream unavailable ({e})'}, 504
+    except ValueError as e:
+        return {'success': False, 'error': str(e)}, 400
+
+    # only builds cost anything: an unchanged preview is served from the cache
+    if not parish.build_cache.path(parish.profile.build_id(payload)).exists():
+        charge(parish)
+    # an editor tab's id: its newer preview replaces its own queued one. Never the address, which
+    # a whole parish office can share
+    client = request.headers.get('X-Client-Id') or request.args.get('client')
+    try:
+        job = parish.build_jobs.submit(data, client)
+    except QueueFull:
+        return {'success': False, 'error': 'Too many builds queued'}, 429, {'Retry-After': '2'}
+
+    # the editor waits for its preview; `wait=0` just queues the build
+    job = parish.build_jobs.wait(job, request.args.get('wait', BUILD_WAIT, type=float))
+    if job.status == 'failed':
+        return {'success': False, 'job': job.id, 'error': job.error}, 500
+    if job.finished.is_set() and job.profile is not None:
+        g.profile.merge(job.profile)
+    if job.status != 'done':
+        poll = url_for('job_status', job_id=job.id, key=key)
+        return {'success': True, 'job': job.id, 'status': job.status, 'poll': poll, 'base': digest}, 202, {'Location': poll, 'Retry-After': '1'}
+
+    response = {'success': True, 'job': job.id, **job.result, 'base': digest}
+    if fit is not None:
+        response['autofit'] = fit
+        response['payload'] = data
+    return response, 200
+
+def remember_payload(parish: Parish, data) -> str:
+    '''Keeps a posted payload as a delta base. Returns its hash, the `base` the next delta names.'''
+    digest = hashlib.sha256(canonical_json(data)).hexdigest()
+    with parish.recent_payloads_lock:
+        parish.recent_payloads[digest] = data
+        parish.recent_payloads.move_to_end(digest)
+        while len(parish.recent_payloads) > DELTA_BASES:
+            parish.recent_payloads.popitem(last=False)
+    return digest
+
+# build() readings by (readings etag, layout hash)
+_dated_readings: OrderedDict[tuple[str, str], list[dict]] = OrderedDict()
+_dated_readings_lock = threading.Lock()
+
+def resolve_readings(parish: Parish, data: dict) -> dict:
+    '''
+    `data` with `"readings": {"date": "20250831", "layout": "<template>"}` replaced by the stored
+    readings for that date, laid out like the template's readings (or like the request's own
+    `readings.readings` when there is no `layout`) with the template's options unless the request
+    has its own. Raises FileNotFoundError for unknown dates and templates, ValueError for bad input.
+    '''
+    readings = data.get('readings') if isinstance(data, dict) else None
+    if not isinstance(readings, dict) or 'date' not in readings:
+        return data
+
+    date = parse_date(str(readings['date']))
+    found = readings_store.get(date)
+    if found is None:
+        raise FileNotFoundError(f'No readings for {date}')
+    scraped, readings_etag = found
+
+    options, layout = readings.get('options'), readings.get('readings', [])
+    if readings.get('layout'):
+        try:
+            template = parish.template_store.get(safe_filename(str(readings['layout'])))[0]
+        except FileNotFoundError:
+            raise FileNotFoundError(f'Layout template {readings["layout"]!r} not found') from None
+        template_readings = template.get('readings') or {}
+        options = options or template_readings.get('options')
+        layout = template_readings.get('readings', [])
+    if options is None:
+        raise ValueError('readings.options is missing (and there is no layout template to take it from)')
+
+    key = readings_etag, hashlib.sha256(canonical_json(layout)).hexdigest()
+    with _dated_readings_lock:
+        blocks = _dated_readings.get(key)
+        if blocks is not None:
+            _dated_readings.move_to_end(key)
+    if blocks is None:
+        try:
+            blocks = reading_blocks(scraped, reading_layouts(layout))
+        except (AttributeError, KeyError, TypeError) as e:
+            raise ValueError(f'readings for {date} do not fit the layout: {type(e).__name__}: {e}') from None
+        with _dated_readings_lock:
+            _dated_readings[key] = blocks
+            while len(_dated_readings) > 256:
+                _dated_readings.popitem(last=False)
+
+    return {**data, 'readings': {'options': options, 'readings': blocks}}
+
+def run_build(parish: Parish, data: dict) -> dict:
+    '''A /build job: renders `data` (unless cached), starts its PDF and makes it the latest build.'''
+    build_id, cached = ensure_build(parish, data)
+    parish.pdf_pipeline.preconvert(parish.build_cache.path(build_id))
+    write_atomic(parish.root/'cache'/'latest', build_id)
+
+    if parish.database is not None:
+        parish.database.record_build(data, build_id, parish.build_cache.path(build_id).relative_to(parish.root))
+    else:
+        parish.latest_file.save(data)
+
+    return {'id': build_id, 'cached': cached}
+
+BUILD_WAIT = float(os.getenv('BUILD_WAIT', 60))
+
+def scheduled_payload(parish: Parish, template: str, date: str) -> dict:
+    '''The issue of `template` for `date`: the template with that day's readings laid out like its own.'''
+    try:
+        data = parish.template_store.get(safe_filename(template))[0]
+    except FileNotFoundError:
+        raise FileNotFoundError(f'Template {template!r} not found') from None
+    return resolve_readings(parish, {**data, 'readings': {**data['readings'], 'date': date}})
+
+def prerender(parish: Parish, template: str, date: str, pdf: bool) -> str:
+    '''A scheduled issue into the build (and PDF) cache. Returns its build id.'''
+    build_id, _ = ensure_build(parish, scheduled_payload(parish, template, date))
+    if pdf:
+        _, job = parish.pdf_pipeline.submit(parish.build_cache.path(build_id))
+        if job is not None:
+            job.result(timeout=float(os.getenv('PDF_TIMEOUT', 300)))
+    return build_id
+
+@app.route('/scheduled')
+def scheduled():
+    key = request.args.get('key')
+    parish = parishes.get(key)
+    if parish is None:
+        abort(403)
+
+    status = parish.scheduler.status()
+    for entry in status['issues']:
+        entry['url'] = url_for('scheduled_issue', template=entry['template'], file=f'{entry["date"]}.docx', key=key)
+    return status, 200
+
+@app.route('/scheduled/<template>/<file>')
+def scheduled_issue(template, file):
+    '''`/get` for the issue of `template` on a date (`<yyyymmdd>.docx` or `.pdf`), rendered now if the scheduler has not.'''
+    key = request.args.get('key')
+    parish = parishes.get(key)
+    if parish is None:
+        abort(403)
+
+    date, _, ext = file.rpartition('.')
+    try:
+        build_id, _ = ensure_build(parish, scheduled_payload(parish, template, parse_date(date)), charged=False)
+    except FileNotFoundError as e:
+        return {'success': False, 'error': str(e)}, 404
+    except UpstreamError as e:
+        return {'success': False, 'error': f'Readings upstream unavailable ({e})'}, 504
+    except (KeyError, TypeError, ValueError) as e:
+        return {'success': False, 'error': str(e)}, 400
+
+    return download(f'{build_id}.{ext}')
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    key = request.args.get('key')
+    parish = parishes.get(key)
+    if parish is None:
+        abort(403)
+
+    job = parish.build_jobs.get(job_id)
+    if job is None:
+        return {'success': False, 'error': 'Job Not Found'}, 404
+
+    return {'success': True, **job.status_report()}, 200
+
+@app.route('/preflight', methods=['POST'])
+def preflight_check():
+    key = request.args.get('key')
+    parish = parishes.get(key)
+    if parish is None:
+        abort(403)
+
+    data = request.get_json()
+    start = time.perf_counter()
+    try:
+        report = preflight(resolve_readings(parish, data), parish.profile.logo, parish.profile.copyright, parish.profile.dpa)
+    except FileNotFoundError as e:
+        return {'success': False, 'error': str(e)}, 404
+    except UpstreamError as e:
+        return {'success': False, 'error': f'Readings upstream unavailable ({e})'}, 504
+    except ValueError as e:
+        return {'success': False, 'error': str(e)}, 400
+
+    return {'success': True, **report, 'ms': round((time.perf_counter() - start) * 1000, 2)}, 200
+
+@app.route('/build/batch', methods=['POST'])
+def build_batch():
+    key = request.args.get('key')
+    parish = parishes.get(key)
+    if parish is None:
+        abort(403)
+
+    body = request.get_json()
+    try:
+        items = batch_items(body, partial(load_template, parish), partial(resolve_readings, parish))
+        formats = body.get('formats', ['docx'])
+        if not formats or set(formats) - {'docx', 'pdf'}:
+            raise ValueError('formats must be a list of docx and/or pdf')
+    except FileNotFoundError:
+        return {'success': False, 'error': 'Template Not Found'}, 404
+    except (AttributeError, TypeError, ValueError) as e:
+        return {'success': False, 'error': str(e)}, 400
+
+    missing = {}
+    for name, payload, error in items:
+        if not error:
+            build_id = parish.profile.build_id(payload)
+            missing[name] = build_id, parish.build_cache.lookup(build_id) is None
+    charge(parish, sum(build for _, build in missing.values()))
+
+    builds = {}
+    for name, payload, error in items:
+        if not error:
+            build_id, build = missing[name]
+            job = parish.batch_threads.submit(render_batch_item, parish, payload, build_id) if build else None
+            builds[name] = build_id, job
+
+    return Response(batch_archive(parish, items, builds, formats), mimetype='application/zip', headers={
+        'Content-Disposition': 'attachment; filename=bulletins.zip',
+    })
+
+def render_batch_item(parish: Parish, payload, build_id: str) -> str:
+    '''A batch item, rendered by the shared worker pool while it holds one of the parish's slots.'''
+    with parish.slots:
+        return pool().submit(render, payload, str(parish.build_cache.path(build_id)), **parish.profile.assets()).result()
+
+def batch_archive(parish: Parish, items, builds, formats):
+    '''
+    Streams the /build/batch ZIP: each bulletin as soon as it is rendered, then the PDFs, then
+    manifest.json with the outcome of every item.
+    '''
+    archive = ZipStream()
+    manifest = []
+    pdf_jobs = {}
+    for name, payload, error in items:
+        entry = {'name': name, 'success': False}
+        manifest.append(entry)
+        if error:
+            entry['error'] = error
+            continue
+
+        build_id, job = builds[name]
+        entry['id'] = build_id
+        try:
+            if job is not None:
+                job.result()
+        except Exception as e:
+            entry['error'] = f'{type(e).__name__}: {e}'
+            continue
+
+        docx = parish.build_cache.path(build_id)
+        if 'docx' in formats:
+            yield from archive.write(docx, f'{name}.docx')
+        if 'pdf' in formats:
+            pdf_jobs[name] = parish.pdf_pipeline.submit(docx)
+        entry['success'] = True
+
+    for entry in manifest:
+        if entry['name'] not in pdf_jobs:
+            continue
+        digest, job = pdf_jobs[entry['name']]
+        try:
+            if job is not None:
+                job.result(timeout=float(os.getenv('PDF_TIMEOUT', 300)))
+            yield from archive.write(parish.pdf_pipeline.get(digest), f'{entry["name"]}.pdf')
+        except Exception as e:
+            entry['success'] = False
+            entry['error'] = parish.pdf_pipeline.error(digest) or f'{type(e).__name__}: {e}'
+
+    yield from archive.writestr('manifest.json', json.dumps({'items': manifest}, indent=4))
+    yield from archive.close()
+    parish.build_cache.evict()
+
+@app.route('/cache')
+def cache_stats():
+    key = request.args.get('key')
+    parish = parishes.get(key)
+    if parish is None:
+        abort(403)
+
+    return {
+        'parish': parish.name,
+        'build': parish.build_cache.stats(),
+        'jobs': parish.build_jobs.stats(),
+        'limits': parish.stats(),
+        'readings': readings_store.stats(),
+    }, 200
+
+@app.route('/metrics')
+def metrics():
+    key = request.args.get('key')
+    parish = parishes.get(key)
+    if parish is None:
+        abort(403)
+
+    return Response(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@registry.collector
+def cache_metrics():
+    caches = {
+        'build': (sum(p.build_cache.hits for p in parishes.values()), sum(p.build_cache.misses for p in parishes.values())),
+        'readings': (readings_store.hits, readings_store.misses),
+    }
+    for name, func in (('markup', compile_markup), ('line_count', line_count)):
+        info = func.cache_info()
+        caches[name] = info.hits, info.misses
+    return [
+        ('bulletins_cache_hits_total', 'counter', 'Lookups answered from a cache.',
+            [({'cache': name}, hits) for name, (hits, _) in caches.items()]),
+        ('bulletins_cache_misses_total', 'counter', 'Lookups that missed a cache.',
+            [({'cache': name}, misses) for name, (_, misses) in caches.items()]),
+        ('bulletins_build_jobs_pending', 'gauge', 'Builds queued or running.',
+            [({'parish': p.name}, p.build_jobs.stats()['pending']) for p in parishes.values()]),
+    ]
 
 @app.route('/get/<file>')
 def download(file):
     key = request.args.get('key')
-    if key != API_KEY:
+    parish = parishes.get(key)
+    if parish is None:
         abort(403)
 
-    if file.endswith('docx'):
-        path = cwd/'output.docx'
-    elif file.endswith('pdf'):
-        convert(cwd/'output.docx', cwd/'output.pdf')
-        path = cwd/'output.pdf'
+    build_id, _, ext = file.rpartition('.')
+    if ext not in ('docx', 'pdf'):
+        abort(404)
 
-    if not path.exists():
+    # `/get/docx` and `/get/<timestamp>.docx` mean the most recent build
+    if not BUILD_ID.fullmatch(build_id):
+        latest_path = parish.root/'cache'/'latest'
+        if not latest_path.exists():
+            abort(404)
+        build_id = latest_path.read_text()
+
+    path = parish.build_cache.get(build_id)
+    if path is None:
         abort(404)
 
-    return send_file(path, as_attachment=True)
+    if ext == 'pdf':
+        error = parish.pdf_pipeline.error(file_hash(path))
+        if error:
+            return {'success': False, 'error': error}, 500
+
+        digest, job = parish.pdf_pipeline.submit(path)
+        if job is not None:
+            try:
+                job.result(timeout=request.args.get('wait', 0, type=float))
+            except FutureTimeout:
+                poll = url_for('download', file=f'{build_id}.pdf', key=key)
+                return {'success': True, 'status': 'pending', 'poll': poll}, 202, {'Location': poll, 'Retry-After': '2'}
+            except Exception:
+                return {'success': False, 'error': parish.pdf_pipeline.error(digest)}, 500
+
+        path = parish.pdf_pipeline.get(digest)
+        if path is None:
+            abort(404)
+
+    return send_file(path, as_attachment=True, download_name=f'output.{ext}', etag=f'{build_id}.{ext}')
+
+def conditional(data, etag: str):
+    '''JSON response that answers a matching If-None-Match with 304 Not Modified.'''
+    response = jsonify(data)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
 
 @app.route('/latest')
 def latest():
     key = request.args.get('key')
-    if key != API_KEY:
+    parish = parishes.get(key)
+    if parish is None:
+        abort(403)
+
+    try:
+        return conditional(*latest_payload(parish))
+    except FileNotFoundError:
+        # a parish that has not built anything yet
+        return {'success': False, 'error': 'Nothing Built Yet'}, 404
+
+def latest_payload(parish: Parish) -> tuple[dict, str]:
+    if parish.database is not None:
+        try:
+            return parish.database.latest()
+        except FileNotFoundError:
+            # nothing built since switching to the database
+            pass
+    return parish.latest_file.load()
+
+@app.route('/history')
+def history():
+    key = request.args.get('key')
+    parish = parishes.get(key)
+    if parish is None:
+        abort(403)
+
+    if parish.database is None:
+        return {'success': False, 'error': 'History needs DATABASE'}, 404
+
+    try:
+        limit = min(int(request.args.get('limit', 50)), 500)
+        before = request.args.get('before', type=int)
+    except ValueError:
+        return {'success': False, 'error': 'Bad limit'}, 400
+
+    builds = parish.database.history(limit, before)
+    for entry in builds:
+        entry['url'] = url_for('download', file=f'{entry["build"]}.docx', key=key)
+    return {'builds': builds}, 200
+
+@app.route('/history/<int:entry>')
+def history_entry(entry):
+    key = request.args.get('key')
+    parish = parishes.get(key)
+    if parish is None:
         abort(403)
 
-    with open(cwd/'latest.json', encoding='utf-8') as f:
-        data = json.load(f)
+    if parish.database is None:
+        return {'success': False, 'error': 'History needs DATABASE'}, 404
 
-    return data
+    found = parish.database.build(entry)
+    if found is None:
+        return {'success': False, 'error': 'Build Not Found'}, 404
+
+    # evicted artifacts (or a changed logo) are rebuilt from the stored payload
+    build_id, cached = ensure_build(parish, found['payload'], charged=False)
+    found['cached'] = cached and build_id == found['build']
+    found['url'] = url_for('download', file=f'{build_id}.docx', key=key)
+    return found, 200
+
+@app.route('/readings/<date>')
+def get_readings(date):
+    key = request.args.get('key')
+    parish = parishes.get(key)
+    if parish is None:
+        abort(403)
+
+    try:
+        found = readings_store.get(parse_date(date))
+    except ValueError as e:
+        return {'success': False, 'error': str(e)}, 400
+    except FileNotFoundError:
+        found = None
+    except UpstreamError as e:
+        return {'success': False, 'error': f'Readings upstream unavailable ({e})'}, 504
+    if found is None:
+        return {'success': False, 'error': 'Readings Not Found'}, 404
+
+    return conditional(*found)
 
 @app.route('/templates')
 def templates():
     key = request.args.get('key')
-    if key != API_KEY:
+    parish = parishes.get(key)
+    if parish is None:
         abort(403)
 
-    filenames = [f.name.split('.json')[0] for f in (cwd/'json').glob('*.json')]
-
-    return {'files': filenames}, 200
+    return conditional({'files': parish.template_store.names()}, parish.template_store.etag())
 
 def safe_filename(filename: str) -> str:
     return re.sub(r'[^a-zA-Z0-9\-_ ]', '', filename)
 
+def load_template(parish: Parish, name: str) -> dict:
+    return parish.template_store.get(safe_filename(name))[0]
+
 @app.route('/template/get/<file>')
 def get_template(file):
     key = request.args.get('key')
-    if key != API_KEY:
+    parish = parishes.get(key)
+    if parish is None:
         abort(403)
 
-    with open(cwd/f'json/{safe_filename(file)}.json', encoding='utf-8') as f:
-        data = json.load(f)
-
-    return data
+    try:
+        return conditional(*parish.template_store.get(safe_filename(file)))
+    except FileNotFoundError:
+        return {'success': False, 'error': 'File Not Found'}, 404
 
 @app.route('/template/save/<file>', methods=['POST'])
 def save_template(file):
     key = request.args.get('key')
-    if key != API_KEY:
+    parish = parishes.get(key)
+    if parish is None:
         abort(403)
 
     data = request.get_json()
-    with open(cwd/f'json/{safe_filename(file)}.json', 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=4)
+    parish.template_store.save(safe_filename(file), data)
+    parish.scheduler.invalidate(safe_filename(file))
 
     return {'success': True}, 200
 
 @app.route('/template/delete/<file>')
 def delete_template(file):
     key = request.args.get('key')
-    if key != API_KEY:
+    parish = parishes.get(key)
+    if parish is None:
         abort(403)
 
     try:
-        os.remove(cwd/f'json/{safe_filename(file)}.json')
+        parish.template_store.delete(safe_filename(file))
     except FileNotFoundError:
         return {'success': False, 'error': 'File Not Found'}, 500
+    parish.scheduler.invalidate(safe_filename(file))
+
+    return {'success': True}, 200
 
-    return {'success': True}, 200
\ No newline at end of file
+# PARISHES (default parishes.json) lists the parishes this instance serves, by API key; without
+# it, API_KEY is the one parish. Set up last, so everything their queues and schedulers call is defined
+profiles = load_profiles(cwd/os.getenv('PARISHES', 'parishes.json'), cwd, API_KEY)
+if DATABASE and Path(DATABASE).is_absolute() and len(profiles) > 1:
+    raise ValueError(f'DATABASE={DATABASE} would be shared by every parish; give a relative path to keep one under each root')
+parishes = {key: Parish(profile) for key, profile in profiles.items()}
+for parish in parishes.values():
+    parish.build_jobs.recover()
+    if parish.scheduler.enabled():
+        parish.scheduler.start()
@@ -0,0 +1,91 @@
+from cache import canonical_json, write_atomic
+
+from pathlib import Path
+import hashlib
+import json
+import os
+import threading
+
+class JsonFile:
+    '''A JSON file parsed once and kept until its size or mtime changes.'''
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._stamp = None
+        self._data = None
+        self._etag = None
+        self._lock = threading.Lock()
+
+    def load(self) -> tuple[dict, str]:
+        '''(data, etag). The data is shared between requests, so treat it as read-only.'''
+        st = self.path.stat()
+        stamp = (st.st_size, st.st_mtime_ns)
+        with self._lock:
+            if stamp != self._stamp:
+                raw = self.path.read_bytes()
+                self._data = json.loads(raw)
+                self._etag = hashlib.sha256(raw).hexdigest()
+                self._stamp = stamp
+            return self._data, self._etag
+
+    def save(self, data: dict) -> str:
+        # minified: about a quarter smaller than indented, and still fine to edit by hand
+        raw = json.dumps(data, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+        with self._lock:
+            write_atomic(self.path, raw)
+            st = self.path.stat()
+            self._data = data
+            self._etag = hashlib.sha256(raw).hexdigest()
+            self._stamp = (st.st_size, st.st_mtime_ns)
+            return self._etag
+
+class TemplateStore:
+    '''
+    The saved templates in `root` (`<name>.json`), indexed in memory. The listing is rebuilt only
+    when the directory mtime changes (every save and delete renames or unlinks a file in it) and
+    each template is re-parsed only when its own size or mtime changes, so edits made by hand or
+    by another worker are still picked up.
+    '''
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._files: dict[str, JsonFile] = {}
+        self._names: list[str] = []
+        self._stamp = None
+        self._lock = threading.Lock()
+
+    def _file(self, name: str) -> JsonFile:
+        with self._lock:
+            if name not in self._files:
+                self._files[name] = JsonFile(self.root/f'{name}.json')
+            return self._files[name]
+
+    def names(self) -> list[str]:
+        stamp = os.stat(self.root).st_mtime_ns
+        with self._lock:
+            if stamp != self._stamp:
+                # dot files are in-flight atomic writes
+                self._names = sorted(
+                    f.name[:-len('.json')] for f in os.scandir(self.root)
+                    if f.name.endswith('.json') and not f.name.startswith('.')
+                )
+                self._files = {name: f for name, f in self._files.items() if name in self._names}
+                self._stamp = stamp
+            return self._names
+
+    def etag(self) -> str:
+        '''Changes whenever the listing does.'''
+        return hashlib.sha256(canonical_json(self.names())).hexdigest()
+
+    def get(self, name: str) -> tuple[dict, str]:
+        '''(template, etag). Raises FileNotFoundError for unknown names.'''
+        return self._file(name).load()
+
+    def save(self, name: str, data: dict) -> str:
+        return self._file(name).save(data)
+
+    def delete(self, name: str) -> None:
+        os.remove(self.root/f'{name}.json')
+        with self._lock:
+            self._files.pop(name, None)
@@ -0,0 +1,81 @@
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from time import perf_counter
+
+class Profile:
+    '''Wall time per phase and event counts for one unit of work (usually one `build()`).'''
+
+    def __init__(self):
+        self.spans: dict[str, float] = {}
+        self.counts: Counter[str] = Counter()
+        self._last = perf_counter()
+
+    def add(self, name: str, seconds: float) -> None:
+        self.spans[name] = self.spans.get(name, 0) + seconds
+
+    def merge(self, other: 'Profile') -> None:
+        '''Adds the spans and counts of work done elsewhere, like a job on another thread.'''
+        for name, seconds in other.spans.items():
+            self.add(name, seconds)
+        self.counts.update(other.counts)
+
+    def lap(self, name: str | None = None) -> None:
+        now = perf_counter()
+        if name is not None:
+            self.add(name, now - self._last)
+        self._last = now
+
+    def server_timing(self, total: float | None = None) -> str:
+        '''The spans (and counts, as descriptions) as a `Server-Timing` header value.'''
+        metrics = [f'{name.replace(" ", "-")};dur={seconds * 1000:.1f}' for name, seconds in self.spans.items()]
+        metrics += [f'{name.replace(" ", "-")};desc="{n}"' for name, n in self.counts.items()]
+        if total is not None:
+            metrics.append(f'total;dur={total * 1000:.1f}')
+        return ', '.join(metrics)
+
+_current: ContextVar[Profile | None] = ContextVar('profile', default=None)
+
+@contextmanager
+def profiling():
+    '''Collects every `lap`, `span` and `count` made inside the block, and adds them to the enclosing block's.'''
+    profile, token = begin()
+    try:
+        yield profile
+    finally:
+        end(token)
+        parent = _current.get()
+        if parent is not None:
+            parent.merge(profile)
+
+def begin() -> tuple[Profile, Token]:
+    '''`profiling()` for code that cannot wrap the work in one block, like request hooks.'''
+    profile = Profile()
+    return profile, _current.set(profile)
+
+def end(token: Token) -> None:
+    _current.reset(token)
+
+def lap(name: str | None = None) -> None:
+    '''Charges the time since the previous lap to `name` (or just restarts the clock).'''
+    profile = _current.get()
+    if profile is not None:
+        profile.lap(name)
+
+@contextmanager
+def span(name: str):
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        profile.add(name, perf_counter() - start)
+
+def count(name: str, n: int = 1) -> None:
+    profile = _current.get()
+    if profile is not None:
+        profile.counts[name] += n
@@ -0,0 +1,539 @@
+'''
+`build()` written straight out as WordprocessingML. The bulletin only ever uses a small, fixed part
+of DOCX (two landscape sections, nested fixed-width tables, justified or centred paragraphs, runs
+that are bold, italic, underlined or superscript, List Bullet, one right tab stop and the logo), so
+document.xml is produced as text in one pass instead of as a tree of python-docx proxies, and the
+parts that never change (styles, theme, the logo...) are compressed once and copied into every
+build. The document is the one `bulletin.build` makes; `python bench.py wordml` checks that.
+'''
+from bulletin import GLOBAL_FONT, GLOBAL_PATH, cellMargin, toCellMargin
+from cache import file_hash
+from markup import compile_markup
+from payload import InfoGroup, Notice, Reading
+from readings import COPYRIGHT, DPA_NOTICE, reading_texts
+from timing import count, lap
+
+from collections import OrderedDict
+from functools import lru_cache
+from typing import IO
+import hashlib
+import io
+import math
+import os
+import re
+import struct
+import threading
+import zlib
+
+# python-docx's units: every length is whole EMUs, written out as rounded twips
+def Mm(mm): return int(mm * 36000)
+def Pt(pt): return int(pt * 12700)
+def Twips(tw): return int(tw * 635)
+def twips(emu) -> int: return int(round(int(emu) / 635.0))
+
+PAGE_WIDTH, PAGE_HEIGHT = Twips(twips(Mm(297))), Twips(twips(Mm(210)))
+
+# what lxml refuses to put in a document (python-docx raises the same ValueError)
+INVALID_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ud800-\udfff￾￿]')
+
+def escape(text: str) -> str:
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+class Package:
+    '''
+    Everything in the DOCX except word/document.xml, taken once from a python-docx document with
+    the logo added, and kept compressed: each member as (name, crc, size, deflated bytes).
+    '''
+
+    def __init__(self, logo_path: str):
+        from docx import Document
+        from docx.enum.text import WD_ALIGN_PARAGRAPH
+        from docx.oxml.shape import CT_Inline
+        from lxml import etree
+        import zipfile
+
+        doc = Document()
+        doc.styles['Normal'].paragraph_format.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
+        rId, image = doc.part.get_or_add_image(logo_path)
+        cx, cy = image.scaled_dimensions(Mm(54), None)
+        # docPr id 1: the logo is the only thing in the document with an id
+        self.logo = etree.tostring(CT_Inline.new_pic_inline(1, rId, image.filename, cx, cy), encoding='unicode')
+
+        buf = io.BytesIO()
+        doc.save(buf)
+        self.members = []
+        with zipfile.ZipFile(buf) as z:
+            for name in z.namelist():
+                data = z.read(name)
+                if name == 'word/document.xml':
+                    text = data.decode('utf-8')
+                    self.head = text[:text.index('<w:body>')]
+                    self.index = len(self.members)
+                    self.members.append(None)
+                else:
+                    self.members.append(deflated(name, [data]))
+
+    def write(self, out: IO[bytes], document) -> None:
+        '''Writes the package with `document` (the pieces of word/document.xml, in order) as its body.'''
+        members = list(self.members)
+        members[self.index] = deflated('word/document.xml', (piece.encode('utf-8') for piece in document))
+        write_zip(out, members)
+
+def deflated(name: str, pieces) -> tuple[bytes, int, int, bytes]:
+    c = zlib.compressobj(6, zlib.DEFLATED, -15)
+    crc, size, out = 0, 0, []
+    for piece in pieces:
+        crc, size = zlib.crc32(piece, crc), size + len(piece)
+        out.append(c.compress(piece))
+    out.append(c.flush())
+    return name.encode('utf-8'), crc, size, b''.join(out)
+
+def write_zip(out: IO[bytes], members) -> None:
+    '''A ZIP of already deflated members, written front to back (so `out` need not seek).'''
+    offset, central = 0, []
+    for name, crc, size, data in members:
+        # 1980-01-01 00:00 for every member, so equal documents are equal files
+        header = struct.pack('<4s5H3L2H', b'PK\x03\x04', 20, 0, 8, 0, 33, crc, len(data), size, len(name), 0)
+        out.write(header + name)
+        out.write(data)
+        central.append(struct.pack('<4s6H3L5H2L', b'PK\x01\x02', 20, 20, 0, 8, 0, 33, crc, len(data), size,
+            len(name), 0, 0, 0, 0, 0o600 << 16, offset) + name)
+        offset += len(header) + len(name) + len(data)
+    directory = b''.join(central)
+    out.write(directory)
+    out.write(struct.pack('<4s4H2LH', b'PK\x05\x06', 0, 0, len(members), len(members), len(directory), offset, 0))
+
+# by logo hash, so parishes with their own logos each keep theirs
+_packages: OrderedDict[str, Package] = OrderedDict()
+_packages_lock = threading.Lock()
+
+def package(logo_path: str) -> Package:
+    key = file_hash(logo_path)
+    with _packages_lock:
+        found = _packages.get(key)
+        if found is not None:
+            _packages.move_to_end(key)
+    if found is None:
+        found = Package(logo_path)
+        with _packages_lock:
+            _packages[key] = found
+            while len(_packages) > 8:
+                _packages.popitem(last=False)
+    return found
+
+@lru_cache(maxsize=512)
+def run_properties(size, font, flags) -> str:
+    return (f'<w:rPr><w:rFonts w:ascii="{font}" w:hAnsi="{font}"/>'
+        + ('<w:b/>' if 'b' in flags else '')
+        + ('<w:i/>' if 'i' in flags else '')
+        + f'<w:sz w:val="{int(Pt(size) / 12700.0 * 2)}"/>'
+        + ('<w:u w:val="single"/>' if 'u' in flags else '')
+        + ('<w:vertAlign w:val="superscript"/>' if 's' in flags else '')
+        + '</w:rPr>')
+
+def spacing(line, top, bottom) -> str:
+    return (f'<w:spacing w:line="{twips(line * Twips(240))}" w:lineRule="auto" '
+        f'w:before="{twips(Pt(top))}" w:after="{twips(Pt(bottom))}"/>')
+
+@lru_cache(maxsize=512)
+def paragraph_properties(kind, line, top=0, bottom=0, center=False, left_right=None) -> str:
+    if kind != 'first':
+        top, left_right = 0, None
+    return ('<w:pPr>'
+        + ('<w:pStyle w:val="ListBullet"/>' if kind == 'bullet' else '')
+        + (f'<w:tabs><w:tab w:val="right" w:pos="{twips(left_right)}"/></w:tabs>' if left_right is not None else '')
+        + spacing(line, top, bottom)
+        + (f'<w:ind w:left="{twips(Pt(24))}" w:hanging="{twips(Pt(16))}"/>' if kind == 'bullet' else '')
+        + ('<w:jc w:val="center"/>' if center else '')
+        + '</w:pPr>')
+
+def run_content(txt: str) -> str:
+    if INVALID_XML.search(txt):
+        raise ValueError('All strings must be XML compatible: Unicode or ASCII, no NULL bytes or control characters')
+    out = []
+    for part in re.split(r'([\t\r\n])', txt):
+        if part == '\t':
+            out.append('<w:tab/>')
+        elif part in ('\r', '\n'):
+            out.append('<w:br/>')
+        elif part:
+            space = ' xml:space="preserve"' if len(part.strip()) < len(part) else ''
+            out.append(f'<w:t{space}>{escape(part)}</w:t>')
+    return ''.join(out)
+
+def margins(top, start, bottom, end) -> str:
+    return (f'<w:tcMar><w:top w:w="{top}" w:type="dxa"/><w:start w:w="{start}" w:type="dxa"/>'
+        f'<w:bottom w:w="{bottom}" w:type="dxa"/><w:end w:w="{end}" w:type="dxa"/></w:tcMar>')
+
+def borders(outer: bool) -> str:
+    sides = (*(['top', 'left', 'bottom', 'right'] if outer else []), 'insideH', 'insideV')
+    return '<w:tblBorders>' + ''.join(f'<w:{side} w:val="single" w:sz="4" w:space="0" w:color="000000"/>' for side in sides) + '</w:tblBorders>'
+
+TABLE_LOOK = '<w:tblLook w:firstColumn="1" w:firstRow="1" w:lastColumn="0" w:lastRow="0" w:noHBand="0" w:noVBand="1" w:val="04A0"/>'
+NO_BORDERS = '<w:tcBorders><w:top w:val="nil"/><w:left w:val="nil"/><w:bottom w:val="nil"/><w:right w:val="nil"/></w:tcBorders>'
+ZERO_MARGINS = margins(0, 0, 0, 0)
+
+class Cell:
+    '''
+    One `w:tc`: its properties (width first, the rest in the order python-docx adds them) and its
+    content as (xml, kind) with kind 'p', 'blank' (a paragraph parseText would drop) or 'tbl'.
+    '''
+    __slots__ = ('width', 'props', 'content')
+
+    def __init__(self, width: int, props: str = '', content=None):
+        self.width = width
+        self.props = props
+        self.content = [('<w:p/>', 'blank')] if content is None else content
+
+    def normalize(self, cell_margins=True) -> None:
+        '''`normalize_cell`: drops the first paragraph and zeroes the cell margins.'''
+        for n, (_, kind) in enumerate(self.content):
+            if kind != 'tbl':
+                del self.content[n]
+                break
+        if cell_margins:
+            self.props += ZERO_MARGINS
+
+    def add_table(self, table: 'Table') -> None:
+        self.content.append((table, 'tbl'))
+        self.content.append(('<w:p/>', 'blank'))
+
+    def xml(self) -> str:
+        content = ''.join(xml if kind != 'tbl' else xml.xml() for xml, kind in self.content)
+        return f'<w:tc><w:tcPr><w:tcW w:type="dxa" w:w="{twips(self.width)}"/>{self.props}</w:tcPr>{content}</w:tc>'
+
+class Table:
+    '''A `w:tbl` as `CT_Tbl.new_tbl` makes it: `width` (EMU) split evenly between `cols` columns.'''
+    __slots__ = ('props', 'grid', 'rows', 'heights')
+
+    def __init__(self, rows: int, cols: int, width: int):
+        col_width = Twips(twips(width // cols))
+        self.props = ''
+        self.grid = [col_width] * cols
+        self.rows = [[Cell(col_width) for _ in range(cols)] for _ in range(rows)]
+        self.heights = [''] * rows
+
+    def xml(self) -> str:
+        grid = ''.join(f'<w:gridCol w:w="{twips(w)}"/>' for w in self.grid)
+        rows = ''.join(
+            '<w:tr>' + (f'<w:trPr>{height}</w:trPr>' if height else '') + ''.join(cell.xml() for cell in row) + '</w:tr>'
+            for row, height in zip(self.rows, self.heights)
+        )
+        return f'<w:tbl><w:tblPr><w:tblW w:type="auto" w:w="0"/>{self.props}</w:tblPr><w:tblGrid>{grid}</w:tblGrid>{rows}</w:tbl>'
+
+def row_height(emu, exact: bool = True) -> str:
+    if emu < 0:
+        # python-docx refuses a negative w:trHeight the same way
+        raise ValueError(f'value must be in range 0 to 18446744073709551615 inclusive, got {emu}')
+    return f'<w:trHeight w:val="{twips(emu)}"' + (' w:hRule="exact"/>' if exact else '/>')
+
+def parse_text(cell: Cell, raw_text, size, line, ptop=0, pbottom=0, center=False, left_right=None) -> None:
+    '''`bulletin.parseText`, into `cell`.'''
+    count('parseText')
+    paragraphs = compile_markup(raw_text, left_right is not None)
+
+    keep = [p for p in paragraphs if not p.blank]
+    content = cell.content
+    first = next((n for n, (_, kind) in enumerate(content) if kind != 'tbl'), None)
+    if first is not None and content[first][1] == 'blank':
+        del content[first]
+        first = next((n for n, (_, kind) in enumerate(content) if kind != 'tbl'), None)
+    if not keep and first is None:
+        keep = paragraphs[-1:]
+
+    if keep and keep[-1] is not paragraphs[-1]:
+        pbottom = 0
+
+    count('paragraphs', len(keep))
+    for n, paragraph in enumerate(keep):
+        count('runs', len(paragraph.runs))
+        pPr = paragraph_properties(paragraph.kind, line, ptop, pbottom if n == len(keep) - 1 else 0, center, left_right)
+        runs = ''.join(
+            '<w:r>' + (run_properties(size, GLOBAL_FONT, flags) if flags is not None else '') + (run_content(txt) if txt else '') + '</w:r>'
+            for txt, flags in paragraph.runs
+        )
+        content.append((f'<w:p>{pPr}{runs}</w:p>', 'blank' if paragraph.blank else 'p'))
+
+def merge_down(table: Table, col: int, rows: int) -> Cell:
+    '''Merges column `col` of the first `rows` rows, like `cell(0, col).merge(cell(rows - 1, col))`.'''
+    top = table.rows[0][col]
+    if rows > 1:
+        top.props = '<w:vMerge w:val="restart"/>' + top.props
+        for row in table.rows[1:rows]:
+            row[col].props = '<w:vMerge/>' + row[col].props
+    return top
+
+class Geometry:
+    '''The page setup `bulletin.Skeleton` makes for a pair of front and reading page margins.'''
+
+    def __init__(self, front_page_margins, reading_margins):
+        margin_top, margin_side = Mm(front_page_margins[0]), Mm(front_page_margins[1])
+        top, left, right = round(margin_top * 0.8), round(margin_side * 0.8), round(margin_side * 1.3)
+        middle = margin_side * .9, margin_side * .4
+        self.front_section = top, right, top, left
+        self.front_widths = (
+            round(PAGE_WIDTH / 2 - Twips(twips(left)) - middle[0] / 2),
+            round(PAGE_WIDTH / 2 - Twips(twips(right)) - middle[1] / 2),
+        )
+        self.front_middle = int(sum(middle))
+        self.front_height = PAGE_HEIGHT - 2 * Twips(twips(top))
+
+        reading_top, reading_side = Mm(reading_margins[0]), Mm(reading_margins[1])
+        left, right = round(reading_side * 0.8), round(reading_side * 1.3)
+        middle = reading_side * .9, reading_side * .4
+        self.reading_section = reading_top, right, 0, left
+        self.reading_widths = (
+            round(PAGE_WIDTH / 2 - Twips(twips(left)) - middle[0] / 2),
+            round(PAGE_WIDTH / 2 - Twips(twips(right)) - middle[1] / 2),
+        )
+        self.reading_middle = int(sum(middle))
+        self.reading_height = PAGE_HEIGHT - reading_top - Mm(8)
+
+def section_properties(margins, rsids='') -> str:
+    top, right, bottom, left = (twips(m) for m in margins)
+    return (f'<w:sectPr{rsids}><w:pgSz w:w="{twips(PAGE_WIDTH)}" w:h="{twips(PAGE_HEIGHT)}" w:orient="landscape"/>'
+        f'<w:pgMar w:top="{top}" w:right="{right}" w:bottom="{bottom}" w:left="{left}" w:header="720" w:footer="720" w:gutter="0"/>'
+        '<w:cols w:space="720"/><w:docGrid w:linePitch="360"/></w:sectPr>')
+
+def front_cell(geometry: Geometry, logo: str, info_data, info_size, info_side_width, title, title_size,
+        church_title, church_title_size, church_info, church_info_size, mass_info, mass_info_size) -> Cell:
+    '''The right half of the front page: the title page above the latest-info rows.'''
+    right_half_width = geometry.front_widths[1]
+    cell = Cell(geometry.front_widths[1])
+    cell.normalize()
+
+    info_rows = sum(len(group.lines) + 1 for group in info_data)
+    info_table = Table(len(info_data) + 1, 1, Twips(twips(cell.width)))
+    info_table.props = '<w:tblLayout w:type="autofit"/>' + TABLE_LOOK
+    cell.add_table(info_table)
+
+    side_width = info_side_width / 100
+
+    total, n = 0, 0
+    for m, group in enumerate(info_data):
+        side_size, side, info = group.side_size, group.side, group.lines
+        trow = info_table.rows[m + 1][0]
+        trow.normalize()
+        ttable = Table(len(info), 2 if side else 1, Twips(twips(trow.width)))
+        ttable.props = TABLE_LOOK
+        trow.add_table(ttable)
+
+        cell_margin = 70
+
+        if side:
+            ttable.grid = [int(right_half_width * (1-side_width)), int(right_half_width * side_width)]
+        else:
+            ttable.grid = [int(right_half_width)]
+
+        for tm, line in enumerate(info):
+            row = ttable.rows[tm][0]
+            row.normalize(cell_margins=False)
+            row.props += margins(cell_margin, 80, cell_margin, 80)
+            height = Pt(info_size * 1.22 * line.lines) + cellMargin(2 * cell_margin)
+            if n != info_rows - 1:
+                ttable.heights[tm] = row_height(height)
+            row.width = right_half_width * (1-side_width) if side else right_half_width
+            parse_text(row, line.text, info_size, 1, center=line.align == 1)
+
+            total += height + cellMargin(2 * cell_margin)
+            n += 1
+
+        if side:
+            merged = merge_down(ttable, 1, len(info))
+            merged.normalize(cell_margins=False)
+            merged.props += margins(cell_margin, 80, cell_margin, 80)
+            merged.width = right_half_width * side_width
+
+            parse_text(merged, side, side_size, 1, center=True)
+
+        ttable.props += borders(False)
+
+    lap('info')
+
+    info_table.heights[0] = row_height(Twips(twips(geometry.front_height)) - total, exact=False)
+    front_page = info_table.rows[0][0]
+
+    info_table.props += borders(False)
+
+    front_page.normalize()
+    parse_text(front_page, title, title_size, 1.3, 20, center=True)
+
+    front_page.content.append((f'<w:p><w:pPr>{spacing(1, 5, 0)}<w:jc w:val="center"/></w:pPr><w:r><w:drawing>{logo}</w:drawing></w:r></w:p>', 'p'))
+
+    parse_text(front_page, church_title, church_title_size, 1.2, 13, center=True)
+    parse_text(front_page, church_info, church_info_size, 1.2, 2, center=True)
+
+    if mass_info:
+        width = Twips(twips(front_page.width))
+        match len(mass_info):
+            case 1:
+                mass_table = Table(1, 1, width)
+                mass_table_cells = [mass_table.rows[0][0]]
+            case 2:
+                mass_table = Table(1, 2, width)
+                mass_table_cells = mass_table.rows[0]
+            case 3:
+                mass_table = Table(2, 2, width)
+                mass_table_cells = [mass_table.rows[0][0], mass_table.rows[1][0], merge_down(mass_table, 1, 2)]
+            case 4:
+                mass_table = Table(2, 2, width)
+                mass_table_cells = [mass_table.rows[0][0], mass_table.rows[1][0], mass_table.rows[0][1], mass_table.rows[1][1]]
+            case _:
+                cols = math.ceil(len(mass_info) / 2)
+                mass_table = Table(2, cols, width)
+                mass_table_cells = [mass_table.rows[i][n] for n in range(cols) for i in (0, 1)]
+        mass_table.props = TABLE_LOOK
+        front_page.add_table(mass_table)
+
+        for mass_cell, txt in zip(mass_table_cells, mass_info):
+            mass_cell.normalize(cell_margins=False)
+            mass_cell.props += '<w:vAlign w:val="center"/>' + margins(150, 0, 50, 0)
+            parse_text(mass_cell, txt, mass_info_size, 1, center=True)
+
+    lap('front')
+    return cell
+
+def back_cell(geometry: Geometry, data) -> Cell:
+    '''The left half of the front page: the notices.'''
+    left_half_width = geometry.front_widths[0]
+    cell = Cell(int(left_half_width))
+    cell.normalize()
+
+    data_table = Table(len(data), 1, Twips(twips(cell.width)))
+    data_table.props = '<w:tblLayout w:type="autofit"/>' + TABLE_LOOK
+    cell.add_table(data_table)
+
+    for notice, row in zip(data, data_table.rows):
+        row = row[0]
+        row.normalize(cell_margins=False)
+        margin = toCellMargin(Mm(notice.margin))
+        row.props += margins(margin, 80, margin, 80)
+        row.width = left_half_width
+        parse_text(row, notice.text, notice.size, 1)
+
+    data_table.props += borders(False)
+
+    lap('back')
+    return cell
+
+def reading_cells(geometry: Geometry, readings, reading_heading_spacing, reading_heading_size,
+        copyright_size, copyright_spacing, copyright_page, dpa_page, copyright, dpa_notice) -> tuple[Cell, Cell]:
+    '''Both halves of the reading page.'''
+    left_half_width, right_half_width = geometry.reading_widths
+    cells = Cell(int(left_half_width)), Cell(int(right_half_width))
+    normalized = [False, False]
+
+    def page(left):
+        if not normalized[0 if left else 1]:
+            cells[0 if left else 1].normalize()
+            normalized[0 if left else 1] = True
+        return cells[0 if left else 1]
+
+    for left, text, size, pbottom, heading in reading_texts(readings, reading_heading_size, reading_heading_spacing):
+        parse_text(page(left), text, size, 1, pbottom=pbottom,
+            left_right=(left_half_width if left else right_half_width) if heading else None)
+
+    page(copyright_page == 0)
+    page(dpa_page == 0)
+
+    parse_text(cells[0 if copyright_page == 0 else 1], copyright, copyright_size, 1, pbottom=copyright_spacing)
+    parse_text(cells[0 if dpa_page == 0 else 1], dpa_notice, copyright_size, 1)
+
+    lap('readings')
+    return cells
+
+# (section, fingerprint) -> the section's rendered cells
+_sections: OrderedDict[tuple[str, str], list[str]] = OrderedDict()
+_sections_lock = threading.Lock()
+
+def build(
+    OUTPUT_PATH: str | IO[bytes],
+    front_page_margins: tuple[int | float, int | float],
+    info_data: tuple[InfoGroup, ...],
+    info_size: int | float,
+    info_side_width: int | float,
+    title: str,
+    title_size: int | float,
+    church_title: str,
+    church_title_size: int | float,
+    church_info: str,
+    church_info_size: int | float,
+    mass_info: tuple[str, ...],
+    mass_info_size: int | float,
+    data: tuple[Notice, ...],
+    readings: tuple[Reading, ...],
+    reading_margins: tuple[int | float, int | float],
+    reading_heading_spacing: int | float,
+    reading_heading_size: int | float,
+    copyright_size: int | float,
+    copyright_spacing: int | float,
+    copyright_page: int,
+    dpa_page: int,
+    logo: str | None = None,
+    copyright: str = COPYRIGHT,
+    dpa_notice: str = DPA_NOTICE,
+    incremental: bool = True
+):
+    '''`bulletin.build`, with the same arguments, written without python-docx.'''
+    lap()
+    logo_path = logo or os.path.join(GLOBAL_PATH, 'logo.png')
+    pkg = package(logo_path)
+    geometry = Geometry(front_page_margins, reading_margins)
+    geometry_key = (tuple(front_page_margins), tuple(reading_margins), file_hash(logo_path))
+
+    sections = {
+        'front': (lambda: [front_cell(geometry, pkg.logo, info_data, info_size, info_side_width, title, title_size,
+            church_title, church_title_size, church_info, church_info_size, mass_info, mass_info_size).xml()],
+            (geometry_key, info_data, info_size, info_side_width, title, title_size, church_title, church_title_size,
+            church_info, church_info_size, mass_info, mass_info_size)),
+        'back': (lambda: [back_cell(geometry, data).xml()], (geometry_key, data)),
+        'readings': (lambda: [cell.xml() for cell in reading_cells(geometry, readings, reading_heading_spacing,
+            reading_heading_size, copyright_size, copyright_spacing, copyright_page, dpa_page, copyright, dpa_notice)],
+            (geometry_key, readings, reading_heading_spacing, reading_heading_size, copyright_size, copyright_spacing,
+            copyright_page, dpa_page, copyright, dpa_notice)),
+    }
+    rendered = {}
+    for name, (render, inputs) in sections.items():
+        # the inputs are frozen dataclasses, tuples and scalars, whose repr is exact and stable
+        key = name, hashlib.sha256(repr(inputs).encode()).hexdigest()
+        with _sections_lock:
+            cells = _sections.get(key) if incremental else None
+        if cells is not None:
+            count('cached sections')
+        else:
+            lap('skeleton')
+            cells = render()
+            with _sections_lock:
+                _sections[key] = cells
+                while len(_sections) > 32:
+                    _sections.popitem(last=False)
+        rendered[name] = cells
+    lap('skeleton')
+
+    front_widths = int(geometry.front_widths[0]), geometry.front_middle, int(geometry.front_widths[1])
+    reading_widths = int(geometry.reading_widths[0]), geometry.reading_middle, int(geometry.reading_widths[1])
+    grid = lambda widths: ''.join(f'<w:gridCol w:w="{twips(w)}"/>' for w in widths)
+    middle = lambda width: Cell(width, NO_BORDERS).xml()
+
+    document = (
+        pkg.head, '<w:body>',
+        '<w:tbl><w:tblPr><w:tblW w:type="auto" w:w="0"/><w:tblLayout w:type="fixed"/>', TABLE_LOOK, borders(True), '</w:tblPr>',
+        '<w:tblGrid>', grid(front_widths), '</w:tblGrid>',
+        '<w:tr><w:trPr>', row_height(geometry.front_height), '</w:trPr>',
+        rendered['back'][0], middle(geometry.front_middle), rendered['front'][0], '</w:tr></w:tbl>',
+        '<w:p><w:pPr>', section_properties(geometry.front_section), '</w:pPr></w:p>',
+        '<w:tbl><w:tblPr><w:tblW w:type="auto" w:w="0"/><w:tblLayout w:type="fixed"/>', TABLE_LOOK, '</w:tblPr>',
+        '<w:tblGrid>', grid(reading_widths), '</w:tblGrid>',
+        '<w:tr><w:trPr>', row_height(geometry.reading_height), '</w:trPr>',
+        rendered['readings'][0], middle(geometry.reading_middle), rendered['readings'][1], '</w:tr></w:tbl>',
+        section_properties(geometry.reading_section, ' w:rsidR="00FC693F" w:rsidRPr="0006063C" w:rsidSect="00034616"'),
+        '</w:body></w:document>',
+    )
+
+    # a path, or any writable file: an HTTP response, stdout, a member of an outer archive
+    if hasattr(OUTPUT_PATH, 'write'):
+        pkg.write(OUTPUT_PATH, document)
+    else:
+        with open(os.path.join(GLOBAL_PATH, OUTPUT_PATH), 'wb') as f:
+            pkg.write(f, document)
+    lap('save')
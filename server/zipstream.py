@@ -0,0 +1,64 @@
+from pathlib import Path
+from typing import Iterator
+import io
+import zipfile
+
+CHUNK = 64 * 1024
+
+class _Sink(io.RawIOBase):
+    '''Write-only, unseekable file that hands back whatever was written since the last drain.'''
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+        self._pos = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self._chunks.append(bytes(b))
+        self._pos += len(b)
+        return len(b)
+
+    def tell(self) -> int:
+        return self._pos
+
+    def drain(self) -> bytes:
+        data, self._chunks = b''.join(self._chunks), []
+        return data
+
+class ZipStream:
+    '''
+    A ZIP archive produced as a sequence of chunks, for streamed (chunked) responses.
+    The output is never seeked, so each member's sizes and CRC follow it in a data descriptor and
+    only the chunk being written is held in memory, however many members the archive has.
+
+        archive = ZipStream()
+        yield from archive.write(path, 'a.docx')
+        yield from archive.writestr('manifest.json', text)
+        yield from archive.close()
+    '''
+
+    def __init__(self, compression: int = zipfile.ZIP_DEFLATED):
+        self._sink = _Sink()
+        self._zip = zipfile.ZipFile(self._sink, 'w', compression)
+
+    def _drain(self) -> Iterator[bytes]:
+        data = self._sink.drain()
+        if data:
+            yield data
+
+    def write(self, path: Path, arcname: str) -> Iterator[bytes]:
+        with open(path, 'rb') as src, self._zip.open(arcname, 'w') as dst:
+            while block := src.read(CHUNK):
+                dst.write(block)
+                yield from self._drain()
+        yield from self._drain()
+
+    def writestr(self, arcname: str, data: str | bytes) -> Iterator[bytes]:
+        self._zip.writestr(arcname, data)
+        yield from self._drain()
+
+    def close(self) -> Iterator[bytes]:
+        self._zip.close()
+        yield from self._drain()